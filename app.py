@@ -1,12 +1,17 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 import asyncio
+import hmac
 import os
+import json
 import logging
+import tempfile
 import time
 from src.qa_system import SmartDocumentQA
+from src.qa_initializer import QAInitializer
+from src.server import serve
+from src import telemetry
 from src.logger import Logger
 from src.exception_handler import handle_exceptions
-from threading import Thread
 from config import get_config
 from dotenv import load_dotenv
 load_dotenv()
@@ -28,22 +33,15 @@ Logger(
 )
 logger = logging.getLogger(__name__)
 
+# Collect spans and counters for /metrics from startup, including warm-up indexing
+telemetry.configure(config.get("metrics_enabled", False))
 
-# logger.info("Initializing QA system at startup...")
-# qa_system = SmartDocumentQA()
-# logger.info("QA system initialized")
-
-# Initialize QA system
-qa_system = None
+# Initialize QA system once, in the background; requests that arrive during
+# warm-up wait on the same build instead of starting another one
+qa_initializer = QAInitializer(SmartDocumentQA)
 
-def initialize_qa_system():
-    global qa_system
-    logger.info("Initializing QA system in background...")
-    qa_system = SmartDocumentQA()
-    logger.info("QA system initialized in background.")
-
-# # Start background initialization
-# Thread(target=initialize_qa_system, daemon=True).start() if qa_system is None else None
+# Seconds a request waits for warm-up before being rejected with 503
+init_wait_timeout = config.get("init_wait_timeout", 30)
 
 @app.route('/')
 async def index():
@@ -51,18 +49,55 @@ async def index():
 
     return render_template('index.html')
 
+def get_qa_system():
+    """Return the QA system, waiting up to init_wait_timeout seconds for warm-up."""
+    return qa_initializer.get(timeout=init_wait_timeout)
+
+def not_ready_response():
+    """503 response carrying the current warm-up state."""
+    status = qa_initializer.status()
+    status['error'] = status.get('error') or 'System is still initializing, please retry shortly.'
+    return jsonify(status), 503
+
+def build_metrics(result, start_time):
+    """Format the metrics block returned to the UI."""
+    return {
+        'total_documents': result['total_documents'],
+        'documents_with_matches': len(result['documents_with_matches']),
+        'documents_with_no_matches': len(result['documents_with_no_matches']),
+        'relevant_passages': len(result['source_info']),
+        'avg_score': result['avg_score'],
+        'search_duration': result['search_duration'],
+        'summary_duration': result['summary_duration'],
+        'general_answer_duration': result['general_answer_duration'],
+        'llm_duration': result['llm_duration'],
+        'answer_cache_hit': result['answer_cache']['hit'],
+        'answer_cache_hit_rate': result['answer_cache']['hit_rate'],
+        'context_tokens': result['context']['tokens'],
+        'context_passages_dropped': result['context']['duplicates_dropped'] + result['context']['budget_dropped'],
+        'llm_cache_hit_rate': result['llm_cache']['cache_hit_rate'],
+        'avg_llm_cache_hit_ms': result['llm_cache']['avg_cache_hit_ms'],
+        'avg_llm_call_ms': result['llm_cache']['avg_llm_call_ms'],
+        'total_duration': time.time() - start_time
+    }
+
+def session_id_from_request(data):
+    """Conversation session ID sent by the client in the body or the X-Session-ID header."""
+    session_id = data.get('session_id') or request.headers.get('X-Session-ID')
+    return str(session_id)[:128] if session_id else None
+
+def sse_event(event, data):
+    """Encode a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/ask', methods=['POST'])
 @handle_exceptions
 def ask():
     """Handle user questions."""
-    global qa_system
-    
-    # Initialize QA system if not already done
+    qa_system = get_qa_system()
     if qa_system is None:
-        logger.info("Initializing QA system...")
-        qa_system = SmartDocumentQA()
-        logger.info("QA system initialized")
-        
+        return not_ready_response()
+
     # Get question from request
     data = request.json
     question = data.get('question', '')
@@ -73,8 +108,8 @@ def ask():
     logger.info(f"Processing question: {question}")
     start_time = time.time()
     
-    # Process the question
-    result = qa_system.ask_question(question)
+    # Process the question in the client's conversation
+    result = qa_system.ask_question(question, session_id=session_id_from_request(data))
     
     # Format response for UI
     response = {
@@ -82,45 +117,144 @@ def ask():
         'general_answer': result['general_answer'],
         'source_based_summary': result['source_based_summary'],
         'sources': result['source_info'],
-        'metrics': {
-            'total_documents': result['total_documents'],
-            'documents_with_matches': len(result['documents_with_matches']),
-            'documents_with_no_matches': len(result['documents_with_no_matches']),
-            'relevant_passages': len(result['source_info']),
-            'avg_score': result['avg_score'],
-            'search_duration': result['search_duration'],
-            'total_duration': time.time() - start_time
-        }
+        'metrics': build_metrics(result, start_time)
     }
     
     logger.info(f"Question processed in {time.time() - start_time:.2f} seconds")
     return jsonify(response)
 
+@app.route('/ask/stream', methods=['POST'])
+@handle_exceptions
+def ask_stream():
+    """
+    Handle user questions as a Server-Sent Events stream.
+
+    Emits a "sources" event once retrieval finishes, "summary" and "general"
+    events per generated token, then a final "metrics" event.
+    """
+    qa_system = get_qa_system()
+    if qa_system is None:
+        return not_ready_response()
+
+    data = request.json
+    question = data.get('question', '')
+
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+
+    logger.info(f"Streaming answer for question: {question}")
+    start_time = time.time()
+    session_id = session_id_from_request(data)
+
+    def generate():
+        time_to_first_byte = None
+        time_to_first_token = None
+        try:
+            for event, payload in qa_system.ask_question_stream(question, session_id=session_id):
+                elapsed = time.time() - start_time
+                if time_to_first_byte is None:
+                    time_to_first_byte = elapsed
+                if time_to_first_token is None and event in ('summary', 'general'):
+                    time_to_first_token = elapsed
+
+                if event == 'result':
+                    metrics = build_metrics(payload, start_time)
+                    metrics['time_to_first_byte'] = time_to_first_byte
+                    metrics['time_to_first_token'] = time_to_first_token
+                    logger.info(
+                        f"Question streamed in {metrics['total_duration']:.2f} seconds "
+                        f"(first byte after {time_to_first_byte:.2f} seconds)"
+                    )
+                    yield sse_event('metrics', metrics)
+                else:
+                    yield sse_event(event, payload)
+        except Exception as e:
+            logger.error(f"Streaming answer failed: {e}")
+            yield sse_event('error', {'error': 'An error occurred while processing your question.'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/status')
 async def status():
-    """Check system status."""
-    global qa_system
-    
-    # Check if system is initialized
-    system_ready = qa_system is not None
-    
-    # Get document stats if available
-    doc_count = 0
-    if system_ready and hasattr(qa_system.index, 'docstore'):
-        docstore = qa_system.index.docstore.docs
-        doc_count = len(set(doc.metadata.get('file_path', '') for doc in docstore.values() if 'file_path' in doc.metadata))
-    
-    return jsonify({
-        'status': 'ready' if system_ready else 'initializing',
-        'document_count': doc_count
-    })
+    """Check system status and warm-up progress."""
+    state = qa_initializer.status()
+
+    # Corpus totals come from the index's document catalog, not a docstore scan
+    corpus = {'document_count': 0, 'page_count': 0, 'node_count': 0}
+    if qa_initializer.ready:
+        qa_system = qa_initializer.get()
+        corpus = qa_system.index_manager.catalog.summary()
+        state['sessions'] = qa_system.sessions.stats()
+    state.update(corpus)
+
+    return jsonify(state)
+
+@app.route('/metrics')
+def metrics():
+    """Expose span latency histograms and counters in the Prometheus text format, behind METRICS_TOKEN if set."""
+    if not telemetry.is_enabled():
+        return jsonify({'error': 'Metrics are disabled; set metrics_enabled in config.yml'}), 404
+    token = config.get("metrics_token")
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
 
 def start_server():
+    """Run the single-process Flask development server with the reloader."""
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         logger.info("Starting SmartDocumentQA Web Interface")
-        Thread(target=initialize_qa_system, daemon=True).start() if qa_system is None else None
+        qa_initializer.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
 
+def load_qa_system():
+    """Build the QA system in this process, raising if initialization fails."""
+    if qa_initializer.get() is None:
+        raise RuntimeError(f"QA system initialization failed: {qa_initializer.status().get('error')}")
+
+def preload_workers():
+    """Build the QA system before the workers fork, and have them merge their metrics."""
+    load_qa_system()
+    if telemetry.is_enabled():
+        telemetry.share_between_processes(tempfile.mkdtemp(prefix="luminaqa_metrics_"))
+
+def stop_worker():
+    """Persist a worker's in-memory caches and its final metrics as it exits."""
+    if qa_initializer.ready:
+        qa_initializer.get().save_caches()
+    telemetry.flush()
+
+def start_production_server(workers=None):
+    """
+    Serve the app from multiple worker processes behind a reverse proxy.
+
+    The QA system is loaded once before the workers are forked, so they share
+    the embedding model and index instead of each loading its own. State that
+    changes while serving is shared through files and SQLite: sessions under
+    session_dir, the default conversation, the LLM response cache and, with
+    answer_cache_path, the answer cache. /metrics merges the metrics of all
+    workers. Each worker keeps its own query embedding cache, saved to
+    query_cache_path as it exits, and its own /status counters. Without
+    session_dir, sessions would be private to each worker, so a single worker
+    is started.
+    """
+    workers = workers or config.get("web_workers")
+    if not config.get("session_dir") and workers != 1:
+        logger.warning("session_dir is not set, so sessions cannot be shared between workers; using one worker")
+        workers = 1
+    logger.info(f"Starting SmartDocumentQA Web Interface ({workers or 'one per CPU'} worker processes)")
+    serve(
+        app,
+        host=config.get("web_host", "0.0.0.0"),
+        port=config.get("web_port", 5000),
+        workers=workers,
+        preload=preload_workers,
+        on_worker_exit=stop_worker
+    )
+
 
 if __name__ == '__main__':
     start_server()
@@ -0,0 +1,68 @@
+"""
+Recall@k and latency of the IVF approximate search in MmapVectorStore
+against exact search, on clustered synthetic embeddings.
+
+Usage:
+    python -m benchmarks.ann_recall --nodes 200000 --dim 384 --nprobe 1 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from src.vector_store import MmapVectorStore
+
+
+def clustered_vectors(rng, n, dim, n_topics=2000, spread=1.0):
+    """Gaussian blobs around random topic centres, roughly like sentence embeddings."""
+    centres = rng.standard_normal((n_topics, dim), dtype=np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    return centres[labels] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def run_queries(store, queries, top_k):
+    results, start = [], time.perf_counter()
+    for q in queries:
+        results.append(store.query(VectorStoreQuery(query_embedding=q.tolist(), similarity_top_k=top_k)).ids)
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng, args.nodes + args.queries, args.dim)
+    corpus, queries = vectors[:args.nodes], vectors[args.nodes:]
+    nodes = [TextNode(id_=str(i), text="", embedding=corpus[i].tolist()) for i in range(args.nodes)]
+
+    exact = MmapVectorStore()
+    exact.add(nodes)
+    truth, exact_latency = run_queries(exact, queries, args.top_k)
+    print(f"{args.nodes} vectors x {args.dim} dims, recall@{args.top_k} over {args.queries} queries")
+    print(f"{'search':>16} {'latency (ms)':>13} {'recall':>8}")
+    print(f"{'exact':>16} {exact_latency * 1000:>13.2f} {1.0:>8.3f}")
+
+    start = time.perf_counter()
+    approx = MmapVectorStore(ann="ivf", ivf_nlist=args.nlist, ivf_min_rows=0)
+    approx.add(nodes)
+    approx.query(VectorStoreQuery(query_embedding=queries[0].tolist(), similarity_top_k=1))
+    print(f"IVF build: {time.perf_counter() - start:.2f} s ({approx._ivf.nlist} lists)")
+
+    for nprobe in args.nprobe:
+        approx.ivf_nprobe = nprobe
+        found, latency = run_queries(approx, queries, args.top_k)
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+        print(f"{f'ivf nprobe={nprobe}':>16} {latency * 1000:>13.2f} {recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
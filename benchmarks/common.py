@@ -0,0 +1,122 @@
+import hashlib
+import os
+import random
+import time
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import TextNode
+
+WORDS = (
+    "arjuna krishna dharma karma yoga battle chariot wisdom soul duty devotion "
+    "moses covenant exodus prophet temple law mercy faith spirit kingdom light "
+    "river mountain king servant teacher disciple path truth peace war heaven"
+).split()
+
+
+class HashingEmbedding(BaseEmbedding):
+    """Deterministic bag-of-words embedding used to benchmark without a model download."""
+
+    dim: int = 384
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            bucket = int(hashlib.md5(token.encode("utf-8")).hexdigest()[:8], 16)
+            vector[bucket % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts):
+        return [self._embed(text) for text in texts]
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+
+def synthetic_text(rng, n_words=120):
+    """Return a pseudo-random passage built from the benchmark vocabulary."""
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def write_synthetic_corpus(data_dir, n_files, words_per_file=2000, seed=0, start=0):
+    """Write n_files plain-text files of synthetic passages to data_dir and return their paths."""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    paths = []
+    for i in range(start, start + n_files):
+        path = os.path.join(data_dir, f"doc_{i:05d}.txt")
+        paragraphs = [synthetic_text(rng) for _ in range(max(1, words_per_file // 120))]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+class StubChatModel:
+    """
+    Deterministic local stand-in for ChatGroq.
+
+    Each call sleeps for `latency` seconds (spread over the tokens when
+    streaming) and answers with `answer_words` words derived from the prompt.
+    """
+
+    def __init__(self, latency=0.2, answer_words=60, **kwargs):
+        self.latency = latency
+        self.answer_words = answer_words
+
+    def _answer(self, messages):
+        prompt = "".join(message.content for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        return prompt, synthetic_text(rng, self.answer_words)
+
+    @staticmethod
+    def _usage(prompt, answer):
+        input_tokens, output_tokens = len(prompt.split()), len(answer.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def invoke(self, messages):
+        prompt, answer = self._answer(messages)
+        time.sleep(self.latency)
+        return AIMessage(content=answer, usage_metadata=self._usage(prompt, answer))
+
+    def stream(self, messages):
+        prompt, answer = self._answer(messages)
+        words = answer.split()
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(prompt, answer))
+
+
+def build_synthetic_index(n_documents, nodes_per_document=4, embed_model=None, seed=0):
+    """Build an in-memory index of synthetic nodes spread over n_documents files."""
+    rng = random.Random(seed)
+    embed_model = embed_model or HashingEmbedding()
+    nodes = []
+    for d in range(n_documents):
+        for p in range(nodes_per_document):
+            nodes.append(TextNode(
+                text=synthetic_text(rng),
+                metadata={"file_path": f"data/doc_{d:05d}.pdf", "page_label": str(p + 1)},
+            ))
+    return VectorStoreIndex(nodes, embed_model=embed_model)
+
+
+def timed(func, *args, repeat=5, **kwargs):
+    """Return the median wall time of func over `repeat` runs."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        durations.append(time.perf_counter() - start)
+    return sorted(durations)[len(durations) // 2]
@@ -0,0 +1,118 @@
+"""
+Compare embedding backends for the same sentence-transformers model: startup
+time (imports and model load, in a fresh interpreter), single-query latency,
+batch throughput, and cosine parity of every backend against the first one.
+Parity is also checked on one batch mixing very short and over-length texts,
+which catches padding and truncation differences between the tokenizers.
+
+Backends are "torch" (HuggingFaceEmbedding), "onnx" (OnnxEmbedding on the
+model's ONNX export) and "onnx-int8" (the same, dynamically quantized).
+The script exits with status 1 when a backend's minimum cosine similarity to
+the reference falls below --min-cosine, so it can gate a backend switch.
+
+The model is downloaded from the Hub on first use unless --model is a local
+directory.
+
+Usage:
+    python -m benchmarks.embedding_backends --backends torch onnx onnx-int8 --texts 256
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_text
+from config import get_config
+from src.embedding import create_embedding_model
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from src.embedding import create_embedding_model
+model = create_embedding_model({model!r}, cache_size=0, **{options!r})
+model.get_query_embedding("warm up")
+print(time.perf_counter() - start)
+"""
+
+
+def backend_options(backend, onnx_file, threads):
+    if backend == "torch":
+        return {"backend": "torch"}
+    if backend in ("onnx", "onnx-int8"):
+        return {"backend": "onnx", "onnx_file": onnx_file, "quantize": backend == "onnx-int8", "threads": threads}
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def startup_seconds(model_name, options):
+    """Import, load and first-query time of a backend in a fresh interpreter."""
+    script = STARTUP_SCRIPT.format(model=model_name, options=options)
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=get_config(os.path.join(REPO_DIR, "config.yml"))["embedding_model"])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--onnx-file", default="onnx/model.onnx")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--texts", type=int, default=256, help="passages embedded for throughput and parity")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    passages = [synthetic_text(rng, rng.randint(40, 200)) for _ in range(args.texts)]
+    queries = [synthetic_text(rng, rng.randint(5, 15)) for _ in range(args.queries)]
+    # Alternating 1-5 word and 300-600 word texts, embedded in a single forward pass
+    mixed_batch = [synthetic_text(rng, rng.randint(1, 5) if i % 2 else rng.randint(300, 600))
+                   for i in range(args.batch_size)]
+
+    print(f"{args.model}: {args.texts} passages, {args.queries} queries, batch size {args.batch_size}")
+    print(f"{'backend':>10} {'startup (s)':>12} {'query p50 (ms)':>15} {'passages/s':>11} "
+          f"{'min cosine':>11} {'mean cosine':>12} {'mixed min cos':>14}")
+    reference, mixed_reference, failed = None, None, False
+    for backend in args.backends:
+        options = backend_options(backend, args.onnx_file, args.threads)
+        startup = startup_seconds(args.model, options)
+        model = create_embedding_model(args.model, cache_size=0, embed_batch_size=args.batch_size, **options)
+        model.get_query_embedding("warm up")
+
+        latencies = []
+        query_embeddings = []
+        for query in queries:
+            start = time.perf_counter()
+            query_embeddings.append(model.get_query_embedding(query))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        passage_embeddings = model.get_text_embedding_batch(passages)
+        throughput = len(passages) / (time.perf_counter() - start)
+
+        embeddings = np.asarray(query_embeddings + passage_embeddings, dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        mixed = np.asarray(model.get_text_embedding_batch(mixed_batch), dtype=np.float32)
+        mixed /= np.linalg.norm(mixed, axis=1, keepdims=True)
+        if reference is None:
+            reference, mixed_reference = embeddings, mixed
+        cosines = np.sum(embeddings * reference, axis=1)
+        mixed_cosines = np.sum(mixed * mixed_reference, axis=1)
+        failed |= bool(min(cosines.min(), mixed_cosines.min()) < args.min_cosine)
+
+        print(f"{backend:>10} {startup:>12.2f} {np.percentile(latencies, 50):>15.2f} {throughput:>11.1f} "
+              f"{cosines.min():>11.4f} {cosines.mean():>12.4f} {mixed_cosines.min():>14.4f}")
+
+    if failed:
+        print(f"FAILED: a backend's cosine similarity to {args.backends[0]} fell below {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure query embedding throughput and latency under concurrent callers,
+embedding each query on its own vs through the MicroBatcher dispatcher.
+
+The model is simulated: a forward pass costs a fixed overhead plus a small
+per-text cost and releases the GIL while it runs, like a CPU transformer.
+
+Usage:
+    python -m benchmarks.embedding_batching --clients 1 8 32 --wait-ms 0 2 5
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.embedding_batcher import MicroBatcher
+
+
+class SimulatedModel:
+    """Forward pass costs overhead + per_item * batch size; only one pass runs at a time."""
+
+    def __init__(self, overhead, per_item):
+        self.overhead = overhead
+        self.per_item = per_item
+        self._lock = threading.Lock()
+
+    def embed_batch(self, texts):
+        with self._lock:
+            time.sleep(self.overhead + self.per_item * len(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+def run(embed, clients, queries_per_client):
+    def client(client_id):
+        latencies = []
+        for i in range(queries_per_client):
+            start = time.perf_counter()
+            embed(f"question {client_id} {i}")
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = [latency for result in executor.map(client, range(clients)) for latency in result]
+    return np.array(latencies) * 1000, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--queries", type=int, default=20, help="queries per client")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, 5])
+    parser.add_argument("--overhead-ms", type=float, default=8.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    model = SimulatedModel(args.overhead_ms / 1000, args.per_item_ms / 1000)
+    print(f"simulated forward pass: {args.overhead_ms} ms + {args.per_item_ms} ms per text, "
+          f"batch size {args.batch_size}")
+    print(f"{'clients':>8} {'mode':>14} {'queries/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'avg batch':>10}")
+    for clients in args.clients:
+        latencies, elapsed = run(model.embed, clients, args.queries)
+        print(f"{clients:>8} {'unbatched':>14} {latencies.size / elapsed:>10.1f} "
+              f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f} {1.0:>10.1f}")
+        for wait_ms in args.wait_ms:
+            batcher = MicroBatcher(model.embed_batch, max_batch_size=args.batch_size, max_wait=wait_ms / 1000)
+            latencies, elapsed = run(batcher, clients, args.queries)
+            print(f"{clients:>8} {f'batched {wait_ms:g} ms':>14} {latencies.size / elapsed:>10.1f} "
+                  f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 99):>9.2f} "
+                  f"{batcher.stats()['avg_batch_size']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
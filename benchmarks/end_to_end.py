@@ -0,0 +1,229 @@
+"""
+End-to-end benchmark of SmartDocumentQA on a synthetic corpus, offline.
+
+ChatGroq is replaced by a deterministic local stub with a configurable
+latency and the embedding model by the hashing embedding, so this runs on a
+CPU-only box without API keys, a model download or network access. For each
+corpus size it measures:
+
+- index build: SmartDocumentQA.__init__ on an empty storage directory
+- cold start: SmartDocumentQA.__init__ against the persisted index
+- incremental update: SmartDocumentQA.__init__ after changing a few files
+- ask_question latency (sequential) and throughput (concurrent clients)
+
+The answer and LLM response caches are disabled so every question runs the
+whole pipeline. Results are written as JSON together with the commit and
+machine they were measured on; pass an earlier file to --compare to print
+the relative change of every metric.
+
+Usage:
+    python -m benchmarks.end_to_end --sizes 10 50 200 --llm-latency-ms 200 --output results.json
+    python -m benchmarks.end_to_end --sizes 10 50 200 --compare results.json
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import src.llm
+import src.qa_system
+from benchmarks.common import WORDS, HashingEmbedding, StubChatModel, write_synthetic_corpus
+from config import get_config
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics reported per corpus size and whether a higher value is better
+METRICS = {
+    "index_build_s": False,
+    "cold_start_s": False,
+    "incremental_update_s": False,
+    "ask_p50_ms": False,
+    "ask_p95_ms": False,
+    "throughput_qps": True,
+}
+
+
+def benchmark_config(workdir, args):
+    """The repository config with every path moved into workdir and the caches disabled."""
+    config = get_config(os.path.join(REPO_DIR, "config.yml"))
+    config.update({
+        "data_dir": os.path.join(workdir, "data"),
+        "persist_dir": os.path.join(workdir, "storage"),
+        "file_hashes_path": os.path.join(workdir, "file_hashes.txt"),
+        "general_history_path": os.path.join(workdir, "context", "general_conversation_history.jsonl"),
+        "source_history_path": os.path.join(workdir, "context", "source_conversation_history.jsonl"),
+        "source_summary_path": os.path.join(workdir, "context", "source_conversation_summary.json"),
+        "session_dir": os.path.join(workdir, "context", "sessions"),
+        "query_cache_path": None,
+        "llm_cache_path": None,
+        "answer_cache_path": None,
+        "answer_cache_size": 0,
+        "metrics_enabled": False,
+        "parse_workers": args.parse_workers,
+    })
+    return config
+
+
+def use_offline_components(llm_latency, answer_words):
+    """Swap ChatGroq and the HuggingFace embedding model for local deterministic stand-ins."""
+    src.llm.ChatGroq = functools.partial(StubChatModel, latency=llm_latency, answer_words=answer_words)
+    src.qa_system.create_embedding_model = lambda *args, **kwargs: HashingEmbedding()
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the QA pipeline."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def timed_init(config):
+    start = time.perf_counter()
+    with quiet():
+        qa = src.qa_system.SmartDocumentQA(config)
+    return qa, time.perf_counter() - start
+
+
+def make_questions(n, seed=0):
+    rng = random.Random(seed)
+    return [f"What is said about {rng.choice(WORDS)} and {rng.choice(WORDS)}?" for _ in range(n)]
+
+
+def measure_questions(qa, questions, clients):
+    """Return (sequential latencies in ms, concurrent queries per second)."""
+    latencies = []
+    with quiet():
+        for question in questions:
+            start = time.perf_counter()
+            qa.ask_question(question)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # Each client has its own conversation session, as web users do
+        sessions = [f"client-{i % clients}" for i in range(len(questions))]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(qa.ask_question, questions, sessions))
+        elapsed = time.perf_counter() - start
+    return np.array(latencies), len(questions) / elapsed
+
+
+def run_size(n_files, args):
+    workdir = tempfile.mkdtemp(prefix="luminaqa_e2e_")
+    try:
+        config = benchmark_config(workdir, args)
+        write_synthetic_corpus(config["data_dir"], n_files, args.words_per_file)
+
+        qa, index_build = timed_init(config)
+        ingest = dict(qa.index_manager.last_ingest_stats)
+
+        _, cold_start = timed_init(config)
+
+        # Rewrite a few files with new content; their mtime and hash change
+        n_updated = max(1, n_files * args.update_percent // 100)
+        write_synthetic_corpus(config["data_dir"], n_updated, args.words_per_file, seed=1)
+        qa, incremental_update = timed_init(config)
+
+        latencies, throughput = measure_questions(qa, make_questions(args.questions), args.clients)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "files": n_files,
+        "pages": ingest.get("pages", 0),
+        "nodes": ingest.get("nodes", 0),
+        "updated_files": n_updated,
+        "index_build_s": round(index_build, 4),
+        "cold_start_s": round(cold_start, 4),
+        "incremental_update_s": round(incremental_update, 4),
+        "ask_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "ask_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "ask_mean_ms": round(float(latencies.mean()), 2),
+        "throughput_qps": round(throughput, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_rows = {row["files"]: row for row in baseline["results"]}
+    print(f"\nChange vs {baseline_path} (commit {baseline.get('commit')}); + is better")
+    print(f"{'files':>6} " + " ".join(f"{name:>21}" for name in METRICS))
+    for row in results:
+        previous = baseline_rows.get(row["files"])
+        if previous is None:
+            continue
+        changes = []
+        for name, higher_is_better in METRICS.items():
+            if not previous.get(name):
+                changes.append(f"{'n/a':>21}")
+                continue
+            change = (row[name] - previous[name]) / previous[name] * 100
+            changes.append(f"{change if higher_is_better else -change:>+20.1f}%")
+        print(f"{row['files']:>6} " + " ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="corpus sizes in files")
+    parser.add_argument("--words-per-file", type=int, default=2000)
+    parser.add_argument("--update-percent", type=int, default=5, help="files changed for the incremental update")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--parse-workers", type=int, default=1)
+    parser.add_argument("--output", default="end_to_end_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    use_offline_components(args.llm_latency_ms / 1000, args.answer_words)
+
+    results = []
+    print(f"{'files':>6} {'nodes':>7} {'build (s)':>10} {'cold (s)':>9} {'update (s)':>11} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'q/s':>7}")
+    for n_files in args.sizes:
+        row = run_size(n_files, args)
+        results.append(row)
+        print(f"{row['files']:>6} {row['nodes']:>7} {row['index_build_s']:>10.2f} {row['cold_start_s']:>9.2f} "
+              f"{row['incremental_update_s']:>11.2f} {row['ask_p50_ms']:>9.1f} {row['ask_p95_ms']:>9.1f} "
+              f"{row['throughput_qps']:>7.2f}")
+
+    report = {
+        "benchmark": "end_to_end",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
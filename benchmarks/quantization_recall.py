@@ -0,0 +1,69 @@
+"""
+Memory and recall@k of float16 and int8 (per-vector scale) vector storage in
+MmapVectorStore, with and without full-precision rescoring, against the
+exact float32 search.
+
+Each store is persisted and reopened memory-mapped, as after a restart, so
+rescoring reads its candidates from the on-disk float32 copy.
+
+Usage:
+    python -m benchmarks.quantization_recall --nodes 100000 --dim 384 --rescore 2 4
+"""
+import argparse
+import shutil
+import tempfile
+
+import numpy as np
+from llama_index.core.schema import TextNode
+
+from benchmarks.ann_recall import clustered_vectors, run_queries
+from src.vector_store import MmapVectorStore
+
+
+def open_store(nodes, dtype, rescore_factor, workdir):
+    """Build a store, persist it and reopen it from disk."""
+    store = MmapVectorStore(dtype=dtype, rescore_factor=rescore_factor)
+    store.add(nodes)
+    store.persist(f"{workdir}/default__vector_store.json")
+    return MmapVectorStore.from_persist_dir(workdir, dtype=dtype, rescore_factor=rescore_factor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng, args.nodes + args.queries, args.dim)
+    corpus, queries = vectors[:args.nodes], vectors[args.nodes:]
+    nodes = [TextNode(id_=str(i), text="", embedding=corpus[i].tolist()) for i in range(args.nodes)]
+
+    modes = [("float32", 0), ("float16", 0), ("int8", 0)]
+    modes += [(dtype, factor) for dtype in ("float16", "int8") for factor in args.rescore]
+
+    print(f"{args.nodes} vectors x {args.dim} dims, recall@{args.top_k} over {args.queries} queries")
+    print(f"{'storage':>18} {'vectors (MB)':>13} {'vs float32':>11} {'on disk for rescoring (MB)':>27} "
+          f"{'latency (ms)':>13} {'recall':>8}")
+    truth, baseline_bytes = None, None
+    for dtype, factor in modes:
+        workdir = tempfile.mkdtemp(prefix="luminaqa_quant_")
+        try:
+            store = open_store(nodes, dtype, factor, workdir)
+            usage = store.memory_usage()
+            found, latency = run_queries(store, queries, args.top_k)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if truth is None:
+            truth, baseline_bytes = found, usage["vectors"]
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+        label = dtype if not factor else f"{dtype} rescore x{factor}"
+        print(f"{label:>18} {usage['vectors'] / 2**20:>13.1f} {usage['vectors'] / baseline_bytes:>10.0%} "
+              f"{usage['full_precision'] / 2**20:>27.1f} {latency * 1000:>13.2f} {recall:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure the startup scan in get_documents_to_index on a synthetic corpus.
+
+Compares the previous serial whole-file MD5 scan with the chunked, thread-pooled
+scan on a cold start (no manifest) and a warm start (manifest with unchanged
+size/mtime, so nothing is hashed).
+
+Usage:
+    python -m benchmarks.scan_startup --files 3000 --size-kb 256
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from src.file_utils import get_documents_to_index, save_file_hashes
+
+
+def legacy_scan(data_dir):
+    """The previous strategy: read each whole file into memory and hash it serially."""
+    hashes = {}
+    for fname in os.listdir(data_dir):
+        path = os.path.join(data_dir, fname)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                hashes[path] = hashlib.md5(f.read()).hexdigest()
+    return hashes
+
+
+def make_corpus(data_dir, n_files, size_kb):
+    """Write n_files files of random bytes."""
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(n_files):
+        with open(os.path.join(data_dir, f"doc_{i:05d}.pdf"), "wb") as f:
+            f.write(os.urandom(size_kb * 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="luminaqa_scan_")
+    data_dir = os.path.join(workdir, "data")
+    manifest_path = os.path.join(workdir, "file_hashes.txt")
+    try:
+        make_corpus(data_dir, args.files, args.size_kb)
+        print(f"Corpus: {args.files} files x {args.size_kb} KB")
+
+        start = time.perf_counter()
+        legacy_scan(data_dir)
+        print(f"legacy serial scan:        {time.perf_counter() - start:.3f} s")
+
+        start = time.perf_counter()
+        _, manifest = get_documents_to_index(data_dir, manifest_path, max_workers=args.workers)
+        print(f"parallel cold scan:        {time.perf_counter() - start:.3f} s")
+        save_file_hashes(manifest_path, manifest)
+
+        start = time.perf_counter()
+        changed, _ = get_documents_to_index(data_dir, manifest_path, max_workers=args.workers)
+        print(f"warm scan (stat only):     {time.perf_counter() - start:.3f} s ({len(changed)} changed)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
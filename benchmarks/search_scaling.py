@@ -0,0 +1,51 @@
+"""
+Compare per-document retrieval (one embed + search per file) with the
+single-pass grouped retrieval in DocumentProcessor.search_documents.
+
+Usage:
+    python -m benchmarks.search_scaling --sizes 10 50 200 500
+"""
+import argparse
+import contextlib
+import io
+
+from llama_index.core.retrievers import VectorIndexRetriever
+
+from benchmarks.common import HashingEmbedding, build_synthetic_index, timed
+from src.document_processor import DocumentProcessor
+
+QUESTION = "What does krishna teach arjuna about duty and karma yoga?"
+
+
+def legacy_search(index, embed_model, question, top_k=50):
+    """The previous strategy: one retrieve() call for every document in the docstore."""
+    retriever = VectorIndexRetriever(index=index, similarity_top_k=top_k, embed_model=embed_model)
+    all_documents = set(doc.metadata.get("file_path") for doc in index.docstore.docs.values())
+    results = {}
+    for doc_path in all_documents:
+        nodes = retriever.retrieve(question)
+        relevant = [n for n in nodes if n.metadata.get("file_path") == doc_path]
+        results[doc_path] = sorted(relevant, key=lambda n: n.score or 0, reverse=True)[:2]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    embed_model = HashingEmbedding()
+    print(f"{'documents':>10} {'legacy (s)':>12} {'single-pass (s)':>16} {'speedup':>8}")
+    for size in args.sizes:
+        index = build_synthetic_index(size, embed_model=embed_model)
+        processor = DocumentProcessor(index, embed_model)
+
+        legacy = timed(legacy_search, index, embed_model, QUESTION, repeat=args.repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            single = timed(processor.search_documents, QUESTION, repeat=args.repeat)
+        print(f"{size:>10} {legacy:>12.4f} {single:>16.4f} {legacy / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Measure /ask throughput and latency percentiles of the pre-forked server with
+1 vs N worker processes.
+
+The served app runs the real DocumentProcessor search over a synthetic index
+(built once, before the workers fork) and stands in for the two LLM calls
+with a fixed sleep, so no model download or API key is needed.
+
+Usage:
+    python -m benchmarks.serving_throughput --workers 1 4 --clients 16 --requests 800
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+from benchmarks.common import HashingEmbedding, build_synthetic_index
+from src.document_processor import DocumentProcessor
+from src.server import serve
+
+QUESTIONS = [
+    "What does krishna teach arjuna about duty?",
+    "How is the covenant with moses described?",
+    "What is said about the path to peace and truth?",
+    "Who is the servant of the king in the temple?",
+]
+
+
+def create_app(n_documents, llm_latency):
+    """Flask app whose /ask runs retrieval and simulates the LLM round-trips."""
+    app = Flask(__name__)
+    state = {}
+
+    def preload():
+        # Silence the per-search progress prints in the server process
+        sys.stdout = open(os.devnull, "w")
+        embed_model = HashingEmbedding()
+        index = build_synthetic_index(n_documents, embed_model=embed_model)
+        state["processor"] = DocumentProcessor(index, embed_model)
+
+    @app.route("/ask", methods=["POST"])
+    def ask():
+        results = state["processor"].search_documents(request.json["question"])
+        time.sleep(llm_latency)
+        return jsonify({"sources": len(results["source_info"])})
+
+    return app, preload
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            post(http.client.HTTPConnection("127.0.0.1", port, timeout=5), QUESTIONS[0])
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def post(connection, question):
+    connection.request("POST", "/ask", body=json.dumps({"question": question}),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status}")
+
+
+def run_clients(port, clients, total_requests):
+    """Send total_requests over `clients` keep-alive connections; return per-request latencies."""
+    per_client = total_requests // clients
+
+    def client(worker_id):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        latencies = []
+        for i in range(per_client):
+            start = time.perf_counter()
+            post(connection, QUESTIONS[(worker_id + i) % len(QUESTIONS)])
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = [latency for result in executor.map(client, range(clients)) for latency in result]
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 4])
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds slept per request in place of the LLM calls")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    print(f"{args.documents} documents, {args.clients} concurrent clients, {args.requests} requests, "
+          f"simulated LLM latency {args.llm_latency * 1000:.0f} ms")
+    print(f"{'workers':>8} {'req/s':>8} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for workers in args.workers:
+        port = free_port()
+        app, preload = create_app(args.documents, args.llm_latency)
+        server = multiprocessing.get_context("fork").Process(
+            target=serve, args=(app, "127.0.0.1", port), kwargs={"workers": workers, "preload": preload}
+        )
+        server.start()
+        try:
+            wait_until_ready(port)
+            run_clients(port, args.clients, args.clients * 2)  # warm up every worker
+            latencies, elapsed = run_clients(port, args.clients, args.requests)
+        finally:
+            os.kill(server.pid, signal.SIGTERM)
+            server.join()
+
+        latencies_ms = np.array(latencies) * 1000
+        print(f"{workers:>8} {len(latencies) / elapsed:>8.1f} "
+              f"{np.percentile(latencies_ms, 50):>10.1f} {np.percentile(latencies_ms, 99):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
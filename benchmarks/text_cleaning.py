@@ -0,0 +1,67 @@
+"""
+Compare the previous per-phrase str.replace cleaner with the compiled
+single-pass TextCleaner on large texts and on many node-sized passages.
+
+Usage:
+    python -m benchmarks.text_cleaning --sizes-kb 64 1024 8192 --passages 10000
+"""
+import argparse
+import random
+
+from benchmarks.common import synthetic_text, timed
+from src.text_cleaner import DEFAULT_PHRASES, TextCleaner
+
+
+def legacy_clean_text(text):
+    """The previous implementation: one str.replace per phrase plus a discarded encode/decode."""
+    phrases_to_remove = [
+        'http://www.davince.com', 'http://www.davince.com/bible',
+        'Downloaded from www.holybooks.com - https://www.holybooks.com/download-bible/',
+        "Downloaded from www.holybooks.com", "- https://www.holybooks.com/download-bible/",
+        "www.krishna.com", "Copyright © 1998 The Bhaktivedanta Book Trust Int'l. All Rights Reserved.",
+        "\n", "\t"
+    ]
+    for phrase in phrases_to_remove:
+        text = text.replace(phrase, "")
+        text.encode("utf-8", "ignore").decode("utf-8").replace("�", "")
+    return text.strip()
+
+
+def page_text(rng, n_chars):
+    """Synthetic page text sprinkled with boilerplate phrases and line breaks."""
+    parts, size = [], 0
+    while size < n_chars:
+        part = synthetic_text(rng, 40) + "\n"
+        if rng.random() < 0.2:
+            part += rng.choice(DEFAULT_PHRASES) + "\t"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[64, 1024, 8192])
+    parser.add_argument("--passages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cleaner = TextCleaner()
+
+    print(f"{'input':>24} {'legacy (ms)':>12} {'compiled (ms)':>14} {'speedup':>8}")
+    for size_kb in args.sizes_kb:
+        text = page_text(rng, size_kb * 1024)
+        legacy = timed(legacy_clean_text, text, repeat=args.repeat)
+        compiled = timed(cleaner.clean_text, text, repeat=args.repeat)
+        print(f"{f'{size_kb} KB text':>24} {legacy * 1000:>12.2f} {compiled * 1000:>14.2f} {legacy / compiled:>7.1f}x")
+
+    passages = [page_text(rng, 1000) for _ in range(args.passages)]
+    legacy = timed(lambda: [legacy_clean_text(p) for p in passages], repeat=args.repeat)
+    compiled = timed(lambda: [cleaner.clean_text(p) for p in passages], repeat=args.repeat)
+    print(f"{f'{args.passages} x 1 KB passages':>24} {legacy * 1000:>12.2f} {compiled * 1000:>14.2f} "
+          f"{legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
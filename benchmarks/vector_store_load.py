@@ -0,0 +1,113 @@
+"""
+Compare startup time and resident memory of the JSON SimpleVectorStore with
+the memory-mapped MmapVectorStore, plus top-k query latency.
+
+Each load runs in a fresh subprocess and reports the growth of its resident
+set size (read from /proc, so Linux only).
+
+Usage:
+    python -m benchmarks.vector_store_load --nodes 100000 --dim 384
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+
+from src.vector_store import MmapVectorStore
+
+LOAD_SCRIPT = """
+import json, os, sys, time
+import numpy as np
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from src.vector_store import MmapVectorStore
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+kind, persist_dir, dtype, dim = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+rss_before = rss_kb()
+start = time.perf_counter()
+if kind == "json":
+    store = SimpleVectorStore.from_persist_dir(persist_dir)
+else:
+    store = MmapVectorStore.from_persist_dir(persist_dir, dtype=dtype)
+load = time.perf_counter() - start
+
+query = VectorStoreQuery(query_embedding=np.random.default_rng(1).standard_normal(dim).tolist(), similarity_top_k=50)
+store.query(query)
+start = time.perf_counter()
+for _ in range(20):
+    store.query(query)
+query_latency = (time.perf_counter() - start) / 20
+rss_after = rss_kb()
+print(json.dumps({"load": load, "query": query_latency, "rss_kb": rss_after - rss_before}))
+"""
+
+
+def write_stores(workdir, n_nodes, dim):
+    """Persist the same random vectors in the JSON and both binary formats."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_nodes, dim), dtype=np.float32)
+    nodes = [
+        TextNode(id_=f"node-{i}", text="", embedding=vectors[i].tolist())
+        for i in range(n_nodes)
+    ]
+
+    json_dir = os.path.join(workdir, "json")
+    simple = SimpleVectorStore()
+    simple.add(nodes)
+    simple.persist(os.path.join(json_dir, "default__vector_store.json"))
+
+    for dtype in ("float32", "float16"):
+        store = MmapVectorStore(dtype=dtype)
+        store.add(nodes)
+        store.persist(os.path.join(workdir, dtype, "default__vector_store.json"))
+    return json_dir
+
+
+def run_load(kind, persist_dir, dtype, dim):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output(
+        [sys.executable, "-c", LOAD_SCRIPT, kind, persist_dir, dtype, str(dim)],
+        cwd=root, stderr=subprocess.DEVNULL,
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="luminaqa_vectors_")
+    try:
+        json_dir = write_stores(workdir, args.nodes, args.dim)
+        print(f"{args.nodes} vectors x {args.dim} dims")
+        print(f"{'format':>16} {'on disk (MB)':>13} {'load (s)':>9} {'RSS +MB':>9} {'query (ms)':>11}")
+        for label, kind, persist_dir, dtype in [
+            ("json (simple)", "json", json_dir, "float32"),
+            ("mmap float32", "mmap", os.path.join(workdir, "float32"), "float32"),
+            ("mmap float16", "mmap", os.path.join(workdir, "float16"), "float16"),
+        ]:
+            size = sum(os.path.getsize(os.path.join(persist_dir, f)) for f in os.listdir(persist_dir))
+            stats = run_load(kind, persist_dir, dtype, args.dim)
+            print(
+                f"{label:>16} {size / 1e6:>13.1f} {stats['load']:>9.3f} "
+                f"{stats['rss_kb'] / 1024:>9.1f} {stats['query'] * 1000:>11.2f}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ def get_config(config_path="config.yml"):
     # Load sensitive API keys from environment
     config["huggingfacehub_api_token"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
     config["groq_api_key"] = os.getenv("GROQ_API_KEY")
+    config["metrics_token"] = os.getenv("METRICS_TOKEN")
 
     return config
 
@@ -58,7 +58,21 @@ def console_app():
         print(f"Total documents searched: {result['total_documents']}")
         print(f"Relevant passages found: {len(result['source_info'])}")
         print(f"Average relevance score: {result['avg_score']:.4f}")
-        print(f"Document search time: {result['search_duration']:.2f} seconds\n")
+        print(f"Document search time: {result['search_duration']:.2f} seconds")
+        print(f"Source summary time: {result['summary_duration']:.2f} seconds")
+        print(f"General answer time: {result['general_answer_duration']:.2f} seconds")
+        print(f"LLM time (concurrent): {result['llm_duration']:.2f} seconds")
+        context = result['context']
+        print(
+            f"Context: {context['kept']}/{context['passages']} passages, {context['tokens']} tokens "
+            f"({context['duplicates_dropped']} duplicates, {context['budget_dropped']} over budget dropped)"
+        )
+        print(f"Answer cache: {'hit' if result['answer_cache']['hit'] else 'miss'} (hit rate {result['answer_cache']['hit_rate']:.0%})")
+        llm_cache = result['llm_cache']
+        print(
+            f"LLM response cache: {llm_cache['cache_hits']} hits ({llm_cache['avg_cache_hit_ms']:.3f} ms avg), "
+            f"{llm_cache['llm_calls']} calls ({llm_cache['avg_llm_call_ms']:.0f} ms avg)\n"
+        )
 
 
 @handle_exceptions
@@ -109,13 +123,27 @@ def console_app():
         print(f"Total documents searched: {result['total_documents']}")
         print(f"Relevant passages found: {len(result['source_info'])}")
         print(f"Average relevance score: {result['avg_score']:.4f}")
-        print(f"Document search time: {result['search_duration']:.2f} seconds\n")
+        print(f"Document search time: {result['search_duration']:.2f} seconds")
+        print(f"Source summary time: {result['summary_duration']:.2f} seconds")
+        print(f"General answer time: {result['general_answer_duration']:.2f} seconds")
+        print(f"LLM time (concurrent): {result['llm_duration']:.2f} seconds")
+        context = result['context']
+        print(
+            f"Context: {context['kept']}/{context['passages']} passages, {context['tokens']} tokens "
+            f"({context['duplicates_dropped']} duplicates, {context['budget_dropped']} over budget dropped)"
+        )
+        print(f"Answer cache: {'hit' if result['answer_cache']['hit'] else 'miss'} (hit rate {result['answer_cache']['hit_rate']:.0%})")
+        llm_cache = result['llm_cache']
+        print(
+            f"LLM response cache: {llm_cache['cache_hits']} hits ({llm_cache['avg_cache_hit_ms']:.3f} ms avg), "
+            f"{llm_cache['llm_calls']} calls ({llm_cache['avg_llm_call_ms']:.0f} ms avg)\n"
+        )
 
 
         
 @handle_exceptions
-def web_app():
-    """Run the application in web mode."""
+def web_app(dev=False, workers=None):
+    """Run the application in web mode, on the multi-process server unless dev is set."""
     logger = logging.getLogger(__name__)
     logger.info("Starting Smart Document QA Web Interface")
 
@@ -124,7 +152,10 @@ def web_app():
     
     # Import here to avoid unnecessary imports when running in console mode
     import app
-    app.start_server()
+    if dev:
+        app.start_server()
+    else:
+        app.start_production_server(workers=workers)
 
 if __name__ == "__main__":
     # # Load environment variables
@@ -148,9 +179,11 @@ if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Smart Document QA System')
     parser.add_argument('--web', action='store_true', help='Run in web mode')
+    parser.add_argument('--dev', action='store_true', help='With --web, run the Flask development server')
+    parser.add_argument('--workers', type=int, help='With --web, number of worker processes (default: web_workers)')
     args = parser.parse_args()
     
     if args.web:
-        web_app()
+        web_app(dev=args.dev, workers=args.workers)
     else:
         console_app()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows assigned to centroids per block, to bound the temporary score matrix
+ASSIGN_BLOCK_ROWS = 65536
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over normalized vectors.
+
+    Rows are clustered with spherical k-means; a query only scores the rows in
+    its nprobe closest clusters. Row numbers refer to the owning vector store's
+    matrix, so deleted rows are filtered by the store's live mask.
+    """
+
+    def __init__(self, centroids, assignments):
+        """Initialize from trained centroids and the cluster of every row."""
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_rows = len(self.assignments)
+        self._order = None
+        self._offsets = None
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @staticmethod
+    def default_nlist(n_rows):
+        """Rule-of-thumb cluster count: about sqrt(n), at least 1."""
+        return max(1, int(np.sqrt(n_rows)))
+
+    @classmethod
+    def train(cls, matrix, nlist=None, iterations=10, sample_size=None, seed=0):
+        """
+        Cluster the rows of matrix and assign every row to its nearest centroid.
+
+        Args:
+            matrix (np.ndarray): Normalized (or per-row scaled int8) vectors, one per row;
+                may be memory-mapped
+            nlist (int): Number of clusters; defaults to default_nlist(rows)
+            iterations (int): k-means iterations
+            sample_size (int): Rows used for training; defaults to 256 per cluster
+        """
+        n_rows = matrix.shape[0]
+        nlist = min(nlist or cls.default_nlist(n_rows), n_rows)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n_rows, sample_size or nlist * 256)
+        sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        # int8 rows are scaled per row; cluster on direction only
+        sample_norms = np.linalg.norm(sample, axis=1, keepdims=True)
+        sample_norms[sample_norms == 0] = 1.0
+        sample /= sample_norms
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = np.ones(nlist, dtype=bool)
+            empty[present] = False
+            # Re-seed empty clusters from random sample rows
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        index = cls(centroids, np.zeros(0, dtype=np.int32))
+        index.assignments = index.assign(matrix)
+        index.trained_rows = n_rows
+        logger.info(f"Trained IVF index with {nlist} lists over {n_rows} vectors")
+        return index
+
+    def assign(self, vectors):
+        """Return the nearest centroid of each row of vectors."""
+        labels = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], ASSIGN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+            labels[start:start + ASSIGN_BLOCK_ROWS] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def add(self, vectors):
+        """Assign rows appended to the store's matrix to their clusters."""
+        self.assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        self._order = None
+
+    def compact(self, live_rows):
+        """Drop assignments of rows removed when the store was compacted."""
+        self.assignments = self.assignments[live_rows]
+        self._order = None
+
+    def _build_lists(self):
+        self._order = np.argsort(self.assignments, kind="stable")
+        counts = np.bincount(self.assignments, minlength=self.nlist)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def candidates(self, query, nprobe):
+        """Return the rows in the nprobe clusters closest to the normalized query."""
+        if self._order is None:
+            self._build_lists()
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe])
+
+    def save(self, path):
+        """Persist centroids and assignments to an .npz file."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments, trained_rows=self.trained_rows)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save."""
+        with np.load(path) as data:
+            index = cls(data["centroids"], data["assignments"])
+            index.trained_rows = int(data["trained_rows"])
+        return index
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+import numpy as np
+
+from src.embedding_cache import QueryEmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """
+    Bounded cache of answered questions, matched by question embedding similarity.
+
+    Each entry stores the normalized question embedding, the full result dict and
+    the index version it was computed against. A lookup returns the entry of the
+    most similar cached question when the cosine similarity reaches the threshold
+    and the entry was created against the current index version.
+
+    Entries live in a SQLite database, so with a path they are shared by every
+    server worker process and survive restarts; without one the database is in
+    memory and private to the process. Each process keeps the embeddings of the
+    current index version as a matrix and reloads it when another process has
+    committed changes. The oldest entries are evicted beyond max_size.
+    """
+
+    def __init__(self, max_size=256, threshold=0.9, ttl=None, path=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of answers kept before evicting the oldest
+            threshold (float): Minimum cosine similarity between questions for a hit
+            ttl (float): Seconds an entry stays valid, or None to never expire
+            path (str): SQLite database file shared between processes, or None to keep
+                the cache in this process's memory
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+        # SQLite connections must not be shared with forked server workers
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
+        """Open this process's connection to the database, creating the table if needed."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        if self.path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, embedding BLOB, result TEXT, index_version TEXT, created_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_created_at ON answers (created_at)")
+        self._conn.commit()
+        # Embeddings of one index version; (index version, data_version) they were loaded at
+        self._keys = []
+        self._matrix = None
+        self._loaded_at = None
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _cutoff(self, now):
+        return now - self.ttl if self.ttl is not None else float("-inf")
+
+    def _load_matrix(self, index_version, now):
+        """(Re)load the embeddings of index_version when this or another process changed the table."""
+        # data_version changes when another connection commits
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._matrix is not None and self._loaded_at == (index_version, data_version):
+            return
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM answers WHERE index_version = ? AND created_at >= ?",
+            (str(index_version), self._cutoff(now))
+        ).fetchall()
+        self._keys = [key for key, _ in rows]
+        self._matrix = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in rows]) if rows else None
+        self._loaded_at = (index_version, data_version)
+
+    def _best_match(self, key, vector, index_version, now):
+        """(key, similarity) of the closest cached question, or (None, 0.0) when there is none."""
+        row = self._conn.execute(
+            "SELECT 1 FROM answers WHERE key = ? AND index_version = ? AND created_at >= ?",
+            (key, str(index_version), self._cutoff(now))
+        ).fetchone()
+        if row is not None:
+            return key, 1.0
+        self._load_matrix(index_version, now)
+        if self._matrix is None:
+            return None, 0.0
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+    def get(self, question, embedding, index_version):
+        """
+        Return (cached result, similarity) for the closest cached question, or (None, similarity).
+
+        The result is a fresh copy, so callers may modify it freely.
+        """
+        key = QueryEmbeddingCache.normalize(question)
+        now = time.time()
+        with self._lock:
+            match, similarity = self._best_match(key, self._unit(embedding), index_version, now)
+            row = None
+            if match is not None and similarity >= self.threshold:
+                row = self._conn.execute(
+                    "SELECT result FROM answers WHERE key = ? AND index_version = ? AND created_at >= ?",
+                    (match, str(index_version), self._cutoff(now))
+                ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None, similarity
+            self.hits += 1
+        return json.loads(row[0]), similarity
+
+    def put(self, question, embedding, result, index_version):
+        """Store a result, dropping entries of other index versions and the oldest when full."""
+        if self.max_size <= 0:
+            return
+        key = QueryEmbeddingCache.normalize(question)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, embedding, result, index_version, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self._unit(embedding).tobytes(), json.dumps(result), str(index_version), now)
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE index_version != ? OR created_at < ?",
+                (str(index_version), self._cutoff(now))
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE key NOT IN "
+                "(SELECT key FROM answers ORDER BY created_at DESC LIMIT ?)", (self.max_size,)
+            )
+            self._conn.commit()
+            self._matrix = None
+
+    def clear(self):
+        """Drop all cached answers and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._matrix = None
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return this process's hit/miss counters and the current size."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": size,
+                "max_size": self.max_size,
+            }
@@ -0,0 +1,116 @@
+import logging
+from functools import lru_cache
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+class ContextPacker:
+    """
+    Select the retrieved passages sent to the LLM within a token budget.
+
+    Passages are ranked by retrieval score, near-duplicates of a higher-ranked
+    passage (e.g. from overlapping chunks or repeated text across files) are
+    dropped, and the rest are packed greedily until the budget is spent.
+
+    A passage's word count is a lower bound on its token count, so passages
+    that cannot fit are skipped without being tokenized or shingled, and
+    packing stops once no remaining passage can fit. Token counts are cached,
+    since the same passages are retrieved for many questions.
+    """
+
+    def __init__(self, token_budget=3000, overlap_threshold=0.8, shingle_size=5, tokenizer=None,
+                 token_cache_size=4096):
+        """
+        Initialize the packer.
+
+        Args:
+            token_budget (int): Maximum tokens of passage text per prompt; None or 0 for no limit
+            overlap_threshold (float): Fraction of a passage's word shingles already present in a
+                kept passage above which it is treated as a duplicate
+            shingle_size (int): Words per shingle used for duplicate detection
+            tokenizer (callable): Maps text to a list of tokens, at least one per whitespace-separated
+                word; defaults to llama_index's local tiktoken tokenizer
+            token_cache_size (int): Passages whose token counts are cached
+        """
+        self.token_budget = token_budget
+        self.overlap_threshold = overlap_threshold
+        self.shingle_size = shingle_size
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._count_tokens = lru_cache(maxsize=token_cache_size)(self._tokenize_length)
+
+    def _tokenize_length(self, text):
+        return len(self.tokenizer(text))
+
+    def _shingles(self, text):
+        words = text.lower().split()
+        if not words:
+            return set()
+        if len(words) <= self.shingle_size:
+            return {tuple(words)}
+        return {tuple(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def _is_duplicate(self, shingles, kept_shingles):
+        # Empty passages carry nothing new
+        if not shingles:
+            return True
+        for other in kept_shingles:
+            if len(shingles & other) / len(shingles) >= self.overlap_threshold:
+                return True
+        return False
+
+    def pack(self, passages):
+        """
+        Dedupe, rank and pack passages into the token budget.
+
+        Args:
+            passages (list): Dicts with at least "text" and "score"
+
+        Returns:
+            tuple: (kept passage texts in rank order, stats dict with passages, kept,
+                duplicates_dropped, budget_dropped and tokens)
+        """
+        ranked = sorted(passages, key=lambda p: p.get("score") or 0, reverse=True)
+        texts, kept_shingles = [], []
+        tokens = duplicates = over_budget = 0
+
+        # Lower bounds on the token counts, and the smallest bound from each rank onwards
+        min_tokens = [len(passage["text"].split()) for passage in ranked]
+        smallest_from = min_tokens[:]
+        for i in range(len(ranked) - 2, -1, -1):
+            smallest_from[i] = min(smallest_from[i], smallest_from[i + 1])
+
+        for i, passage in enumerate(ranked):
+            if self.token_budget:
+                remaining = self.token_budget - tokens
+                if smallest_from[i] > remaining:
+                    over_budget += len(ranked) - i
+                    break
+                # Keep trying: a shorter, lower-ranked passage may still fit
+                if min_tokens[i] > remaining:
+                    over_budget += 1
+                    continue
+            passage_tokens = self._count_tokens(passage["text"])
+            if self.token_budget and passage_tokens > remaining:
+                over_budget += 1
+                continue
+
+            shingles = self._shingles(passage["text"])
+            if self._is_duplicate(shingles, kept_shingles):
+                duplicates += 1
+                continue
+
+            texts.append(passage["text"])
+            kept_shingles.append(shingles)
+            tokens += passage_tokens
+
+        stats = {
+            "passages": len(passages),
+            "kept": len(texts),
+            "duplicates_dropped": duplicates,
+            "budget_dropped": over_budget,
+            "tokens": tokens,
+        }
+        if duplicates or over_budget:
+            logger.debug(f"Packed {len(texts)}/{len(passages)} passages into {tokens} tokens "
+                         f"({duplicates} duplicates, {over_budget} over budget)")
+        return texts, stats
@@ -0,0 +1,132 @@
+import os
+import json
+import logging
+import threading
+from src.file_utils import load_conversation_log, append_conversation_turn, save_conversation_history
+
+logger = logging.getLogger(__name__)
+
+class ConversationHistory:
+    """Append-only conversation history backed by a JSONL file with an in-memory copy, or kept in memory only."""
+
+    def __init__(self, path, max_entries=None):
+        """
+        Load the history at path once; later turns are appended without rewriting the file.
+
+        Args:
+            path (str): JSONL file holding one {"question", "answer"} record per line;
+                None keeps the history in memory only
+            max_entries (int): If set, compaction keeps only the most recent max_entries turns;
+                a memory-only history is trimmed to them as turns are appended
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Turns trimmed from the front, kept in the file's header; the first
+        # turn in memory is turn number `dropped` of the conversation
+        self._turns, self.dropped = load_conversation_log(path) if path else ([], 0)
+        # (inode, bytes read) of the file, to pick up turns appended by other processes
+        self._file_state = self._stat()
+
+        if self._needs_compaction():
+            self.compact()
+
+    def _stat(self):
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _refresh(self):
+        """Read turns appended to the file by other processes; reload it if it was replaced."""
+        state = self._stat()
+        if state == self._file_state:
+            return
+        known = self._file_state
+        if state is None or known is None or state[0] != known[0] or state[1] < known[1]:
+            # Compacted (or removed) by another process: reload the turns and their offset
+            self._turns, self.dropped = load_conversation_log(self.path) if state is not None else ([], 0)
+            self._file_state = state
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(known[1])
+            content = f.read(state[1] - known[1])
+        # A line still being written is read on the next refresh
+        complete = content[:content.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._turns.append(json.loads(line))
+            except ValueError:
+                continue
+        self._file_state = (state[0], known[1] + len(complete))
+
+    def refresh(self):
+        """
+        Pick up turns other processes recorded since this history was last read or written.
+
+        Callers serialize writers (see SessionLock), so the file holds whole turns
+        when this runs; it is a cheap stat when nothing changed.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._refresh()
+
+    def _needs_compaction(self):
+        """Check for a legacy JSON array file, unparsable lines or too many turns."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        if self.max_entries is not None and len(self._turns) > self.max_entries:
+            return True
+        with open(self.path, "r") as f:
+            line_count = sum(1 for line in f if line.strip())
+        # A non-zero offset takes the header line
+        return line_count != len(self._turns) + bool(self.dropped)
+
+    def append(self, question, answer):
+        """Record a turn in memory and append it to the log in O(1)."""
+        turn = {"question": question, "answer": answer}
+        with self._lock:
+            if self.path:
+                # Turns other processes appended come first, so memory matches the file's order
+                self._refresh()
+            self._turns.append(turn)
+            if self.path:
+                append_conversation_turn(self.path, turn)
+                self._file_state = self._stat()
+            elif self.max_entries is not None and len(self._turns) > self.max_entries:
+                excess = len(self._turns) - self.max_entries
+                del self._turns[:excess]
+                self.dropped += excess
+        return turn
+
+    def tail(self, n):
+        """Return the last n turns, oldest first."""
+        return self._turns[-n:] if n > 0 else []
+
+    def compact(self):
+        """Rewrite the log as clean JSONL, trimming it to max_entries when configured."""
+        with self._lock:
+            if self.max_entries is not None:
+                kept = self._turns[-self.max_entries:] if self.max_entries > 0 else []
+                self.dropped += len(self._turns) - len(kept)
+                self._turns = kept
+            if self.path:
+                save_conversation_history(self.path, self._turns, self.dropped)
+                self._file_state = self._stat()
+        logger.info(f"Compacted conversation history {self.path} to {len(self._turns)} turns")
+
+    def __len__(self):
+        return len(self._turns)
+
+    def __iter__(self):
+        return iter(list(self._turns))
+
+    def __getitem__(self, item):
+        return self._turns[item]
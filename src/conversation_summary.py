@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+def format_turns(turns):
+    """Render conversation turns as Q/A lines for a prompt."""
+    return "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in turns])
+
+class RollingSummary:
+    """Incrementally maintained summary of conversation turns that aged out of the recent window."""
+
+    def __init__(self, path):
+        """Initialize with the JSON file the summary is persisted to, or None to keep it in memory only."""
+        self.path = path
+        self.summary = ""
+        self.summarized_count = 0
+        self.last_question = None
+        self._lock = threading.Lock()
+        # Identity of the file last loaded or saved, to notice saves by other processes
+        self._file_state = None
+        self.load()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        """Load a previously persisted summary if one exists."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            self._file_state = self._stat()
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable conversation summary {self.path}: {e}")
+            return
+        self.summary = data.get("summary", "")
+        self.summarized_count = data.get("summarized_count", 0)
+        self.last_question = data.get("last_question")
+
+    def refresh(self):
+        """Reload the summary if another process saved it since it was last loaded or saved here."""
+        if self.path and self._stat() not in (None, self._file_state):
+            with self._lock:
+                self.load()
+
+    def save(self):
+        """Atomically persist the summary next to the conversation history."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "summary": self.summary,
+                "summarized_count": self.summarized_count,
+                "last_question": self.last_question,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._file_state = self._stat()
+
+    def reset(self):
+        """Forget the current summary."""
+        self.summary = ""
+        self.summarized_count = 0
+        self.last_question = None
+
+    def _is_consistent_with(self, aged_turns, first_index):
+        """Check that the stored summary ends at a turn of aged_turns, or at one trimmed before them."""
+        if self.summarized_count <= first_index:
+            return True
+        last = self.summarized_count - 1 - first_index
+        if last >= len(aged_turns):
+            return False
+        return aged_turns[last]["question"] == self.last_question
+
+    def get_summary(self, aged_turns, summarize, first_index=0):
+        """
+        Return a summary covering aged_turns, summarizing only turns not seen before.
+
+        Args:
+            aged_turns (list): Turns that have left the recent window, oldest first
+            summarize (callable): Called as summarize(previous_summary, new_turns) and
+                returns the updated summary text
+            first_index (int): Position of aged_turns[0] in the whole conversation, i.e. the
+                number of older turns already trimmed from the history; the summary keeps
+                covering those
+
+        Returns:
+            str: Summary of all aged turns
+        """
+        with self._lock:
+            if not self._is_consistent_with(aged_turns, first_index):
+                logger.info("Conversation history changed, rebuilding rolling summary.")
+                self.reset()
+
+            new_turns = aged_turns[max(self.summarized_count - first_index, 0):]
+            if new_turns:
+                logger.debug(f"Folding {len(new_turns)} aged-out turns into the rolling summary")
+                self.summary = summarize(self.summary, new_turns)
+                self.summarized_count = first_index + len(aged_turns)
+                self.last_question = aged_turns[-1]["question"]
+                self.save()
+
+            return self.summary
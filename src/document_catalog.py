@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DocumentCatalog:
+    """
+    Per-file catalog of the indexed corpus.
+
+    Each entry records the IDs of the nodes and page documents created from a
+    file, plus the file's content hash. Totals are kept up to date on insert
+    and delete, so document, page and node counts never require a docstore scan.
+    """
+
+    def __init__(self, entries=None):
+        """Initialize from {file_path: {"ref_doc_ids", "node_ids", "hash"}} entries."""
+        self.entries = {}
+        self.node_count = 0
+        self.page_count = 0
+        self._version = None
+        for path, entry in (entries or {}).items():
+            self._add_entry(path, entry)
+
+    def _add_entry(self, path, entry):
+        entry.setdefault("ref_doc_ids", [])
+        entry.setdefault("node_ids", [])
+        entry.setdefault("hash", None)
+        self.entries[path] = entry
+        self.node_count += len(entry["node_ids"])
+        self.page_count += len(entry["ref_doc_ids"])
+
+    @property
+    def version(self):
+        """Digest of every indexed file's hash and node IDs; changes whenever the index does."""
+        if self._version is None:
+            digest = hashlib.md5()
+            for path in sorted(self.entries):
+                entry = self.entries[path]
+                digest.update(f"{path}\0{entry['hash']}\0{len(entry['node_ids'])}\0".encode("utf-8"))
+                digest.update("\0".join(entry["node_ids"]).encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def document_count(self):
+        return len(self.entries)
+
+    @property
+    def paths(self):
+        """View of every indexed file path."""
+        return self.entries.keys()
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def get(self, path):
+        """Node count, page count and hash of a single file, or None if it is not indexed."""
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        return {"nodes": len(entry["node_ids"]), "pages": len(entry["ref_doc_ids"]), "hash": entry["hash"]}
+
+    def add_nodes(self, nodes, file_hashes=None):
+        """Record inserted nodes under the file path they were created from."""
+        file_hashes = file_hashes or {}
+        self._version = None
+        for node in nodes:
+            path = node.metadata.get("file_path", "Unknown")
+            entry = self.entries.get(path)
+            if entry is None:
+                entry = {"ref_doc_ids": [], "node_ids": [], "hash": file_hashes.get(path)}
+                self.entries[path] = entry
+            entry["node_ids"].append(node.node_id)
+            self.node_count += 1
+            if node.ref_doc_id and node.ref_doc_id not in entry["ref_doc_ids"]:
+                entry["ref_doc_ids"].append(node.ref_doc_id)
+                self.page_count += 1
+
+    def remove(self, path):
+        """Remove and return the entry of path, or None if it is not indexed."""
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self._version = None
+            self.node_count -= len(entry["node_ids"])
+            self.page_count -= len(entry["ref_doc_ids"])
+        return entry
+
+    def set_hashes(self, file_hashes):
+        """Fill in missing hashes, e.g. for a catalog rebuilt from an older index; returns how many."""
+        filled = 0
+        for path, entry in self.entries.items():
+            if entry["hash"] is None and path in file_hashes:
+                entry["hash"] = file_hashes[path]
+                filled += 1
+        if filled:
+            self._version = None
+        return filled
+
+    def summary(self):
+        """Corpus totals for status reporting."""
+        return {
+            "document_count": self.document_count,
+            "page_count": self.page_count,
+            "node_count": self.node_count,
+        }
+
+    @classmethod
+    def from_docstore(cls, docstore):
+        """Rebuild a catalog by scanning every node in the docstore."""
+        catalog = cls()
+        catalog.add_nodes(docstore.docs.values())
+        return catalog
+
+    @classmethod
+    def load(cls, path):
+        """Load a catalog written by save."""
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        """Write the catalog as JSON, replacing the previous file atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, path)
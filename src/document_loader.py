@@ -0,0 +1,83 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from llama_index.core import SimpleDirectoryReader
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypdf.errors import PyPdfError
+    PARSE_ERRORS = (OSError, ValueError, PyPdfError)
+except ImportError:
+    PARSE_ERRORS = (OSError, ValueError)
+
+def file_metadata(fname):
+    """Metadata attached to every page loaded from fname."""
+    return {"file_path": fname}
+
+def load_file(path):
+    """Parse a single file into page Documents."""
+    reader = SimpleDirectoryReader(input_files=[path], file_metadata=file_metadata)
+    return reader.load_data()
+
+def parse_file(path):
+    """Parse a file, returning (path, Documents, None), or (path, None, error) if it is unreadable or malformed."""
+    try:
+        return path, load_file(path), None
+    except PARSE_ERRORS as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+def _checked(result):
+    path, documents, error = result
+    if error is not None:
+        logger.error(f"Failed to parse {path}; it is left out of the index and retried on the next indexing run: {error}")
+    return path, documents
+
+def iter_documents(paths, max_workers=None):
+    """
+    Parse files on a process pool and yield each file's Documents as soon as it is ready.
+
+    At most 2 * max_workers files are in flight, so parsed pages are handed to
+    the caller as they arrive instead of being held in memory all at once.
+    With max_workers <= 1 files are parsed serially in this process.
+    Workers are started by a fork server (or spawned where there is none)
+    rather than forked from this process, which may be running server and
+    background threads whose locks a fork would copy mid-use.
+
+    Args:
+        paths (list): Files to parse
+        max_workers (int): Worker processes; defaults to the CPU count
+
+    Files that fail to parse are logged and yielded with None instead of Documents.
+
+    Yields:
+        tuple: (path, Documents (one per page) with file_path metadata, or None)
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield _checked(parse_file(path))
+        return
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("forkserver")
+        # Imported once in the fork server instead of in every worker
+        mp_context.set_forkserver_preload([__name__])
+    else:
+        mp_context = multiprocessing.get_context("spawn")
+    pending_paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        in_flight = set()
+        for path in pending_paths:
+            in_flight.add(executor.submit(parse_file, path))
+            if len(in_flight) >= 2 * max_workers:
+                break
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for path in pending_paths:
+                    in_flight.add(executor.submit(parse_file, path))
+                    break
+                yield _checked(future.result())
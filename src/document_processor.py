@@ -1,81 +1,119 @@
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+from collections import defaultdict
 from llama_index.core.retrievers import VectorIndexRetriever
-from src.text_cleaner import TextCleaner
+from llama_index.core.schema import QueryBundle
+from src import telemetry
+from src.text_cleaner import TextCleaner, CLEANED_METADATA_KEY
+
+logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
     """Process documents for question answering."""
-    
-    def __init__(self, index, embed_model, cleaner=None):
-        """Initialize with index and embedding model."""
+
+    def __init__(self, index, embed_model, cleaner=None, catalog=None):
+        """
+        Initialize with index and embedding model.
+
+        cleaner is only used for nodes that were indexed without being cleaned.
+        catalog is the index's DocumentCatalog; without one, document paths are
+        collected by scanning the docstore on every search.
+        """
         self.index = index
         self.embed_model = embed_model
         self.cleaner = cleaner or TextCleaner()
-    
-    def process_document(self, question, doc_path, retriever):
-        """Process a single document for relevant content."""
-        try:
-            nodes = retriever.retrieve(question)
-            relevant_nodes = [node for node in nodes if node.metadata.get("file_path") == doc_path]
-            top_nodes = sorted(relevant_nodes, key=lambda n: getattr(n, "score", 0), reverse=True)[:2]
-
-            results = []
-            for node in top_nodes:
-                cleaned_text = self.cleaner.clean_text(node.text)
-                page = node.metadata.get("page_label") or node.metadata.get("page_number", "Unknown")
-                results.append((doc_path, cleaned_text, page, getattr(node, "score", 0)))
-            return doc_path, results
-        except Exception as e:
-            return doc_path, []
-    
-    def search_documents(self, question, top_k=50):
-        """Search documents for relevant content to answer the question."""
-        print("\n🚀 Searching documents concurrently...")
+        self.catalog = catalog
+
+    def document_paths(self):
+        """Paths of every indexed document."""
+        if self.catalog is not None:
+            return self.catalog.paths
+        docstore = self.index.docstore.docs if hasattr(self.index, 'docstore') else {}
+        return set(doc.metadata.get('file_path', 'Unknown') for doc in docstore.values())
+
+    def process_document(self, doc_path, nodes, per_document_k=2):
+        """Select and clean the top-scoring retrieved nodes of a single document."""
+        top_nodes = sorted(nodes, key=lambda n: getattr(n, "score", 0) or 0, reverse=True)[:per_document_k]
+
+        results = []
+        for node in top_nodes:
+            # Nodes indexed before cleaning moved to ingestion are cleaned here
+            if node.metadata.get(CLEANED_METADATA_KEY):
+                cleaned_text = node.text
+            else:
+                with telemetry.span("search.clean_text"):
+                    cleaned_text = self.cleaner.clean_text(node.text)
+            page = node.metadata.get("page_label") or node.metadata.get("page_number", "Unknown")
+            results.append((doc_path, cleaned_text, page, getattr(node, "score", 0)))
+        return doc_path, results
+
+    @staticmethod
+    def group_nodes_by_document(nodes):
+        """Bucket retrieved nodes by their source file path in a single pass."""
+        grouped = defaultdict(list)
+        for node in nodes:
+            grouped[node.metadata.get("file_path", "Unknown")].append(node)
+        return grouped
+
+    def search_documents(self, question, top_k=50, per_document_k=2, query_embedding=None):
+        """
+        Search documents for relevant content to answer the question.
+
+        query_embedding is the question's embedding when the caller already has it.
+        """
+        print("\n🚀 Searching documents...")
         start_time = time.time()
-        
+
         retriever = VectorIndexRetriever(
-            index=self.index, 
-            similarity_top_k=top_k, 
+            index=self.index,
+            similarity_top_k=top_k,
             embed_model=self.embed_model
         )
-        
+
         # Get all unique document paths
-        docstore = self.index.docstore.docs if hasattr(self.index, 'docstore') else {}
-        all_documents = set(doc.metadata.get('file_path', 'Unknown') for doc in docstore.values())
-        
+        all_documents = self.document_paths()
+
         # Initialize result variables
         source_info, source_texts = [], []
         documents_with_matches, documents_with_no_matches = set(), set()
         score_accumulator = []
-        
-        # Process documents concurrently
-        with ThreadPoolExecutor(max_workers=6) as executor:
-            futures = [
-                executor.submit(self.process_document, question, path, retriever) 
-                for path in all_documents
-            ]
-            
-            for future in as_completed(futures):
-                doc_path, nodes = future.result()
-                if nodes:
-                    documents_with_matches.add(doc_path)
-                    for doc, text, page, score in nodes:
-                        source_info.append({
-                            "file": doc, 
-                            "text": text, 
-                            "page": page, 
-                            "score": score
-                        })
-                        source_texts.append(text)
-                        score_accumulator.append(score)
-                else:
-                    documents_with_no_matches.add(doc_path)
-        
+
+        # Embed the query and run the vector search once, then group the hits per document
+        try:
+            if query_embedding is None:
+                with telemetry.span("search.query_embedding"):
+                    query_embedding = self.embed_model.get_query_embedding(question)
+            with telemetry.span("search.vector_search"):
+                nodes = retriever.retrieve(QueryBundle(question, embedding=query_embedding))
+        except Exception:
+            logger.exception("Vector search failed; answering without sources")
+            nodes = []
+        with telemetry.span("search.group_documents"):
+            nodes_by_document = self.group_nodes_by_document(nodes)
+
+        for doc_path in all_documents:
+            doc_path, doc_nodes = self.process_document(
+                doc_path, nodes_by_document.get(doc_path, []), per_document_k
+            )
+            if doc_nodes:
+                documents_with_matches.add(doc_path)
+                for doc, text, page, score in doc_nodes:
+                    source_info.append({
+                        "file": doc,
+                        "text": text,
+                        "page": page,
+                        "score": score
+                    })
+                    source_texts.append(text)
+                    score_accumulator.append(score)
+            else:
+                documents_with_no_matches.add(doc_path)
+
         search_duration = time.time() - start_time
         print(f"✅ Search completed in {search_duration:.2f} seconds.")
-        
+
         avg_score = sum(score_accumulator) / len(score_accumulator) if score_accumulator else 0
-        
+
         return {
             "source_info": source_info,
             "source_texts": source_texts,
@@ -84,4 +122,4 @@ class DocumentProcessor:
             "avg_score": avg_score,
             "search_duration": search_duration,
             "total_documents": len(all_documents),
-        }
\ No newline at end of file
+        }
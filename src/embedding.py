@@ -1,5 +1,151 @@
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+import sys
+import atexit
+from typing import Any, List
 
-def create_embedding_model(model_name):
-    """Create and return a HuggingFace embedding model."""
-    return HuggingFaceEmbedding(model_name=model_name)
\ No newline at end of file
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from src.embedding_cache import QueryEmbeddingCache
+from src.embedding_batcher import MicroBatcher
+from src.onnx_embedding import DEFAULT_ONNX_FILE, OnnxEmbedding
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+def _is_huggingface_model(model):
+    # HuggingFaceEmbedding is imported only by the torch backend, as it pulls in torch
+    module = sys.modules.get("llama_index.embeddings.huggingface")
+    return module is not None and isinstance(model, module.HuggingFaceEmbedding)
+
+class BatchedQueryEmbedding(BaseEmbedding):
+    """Embedding model wrapper that embeds concurrent queries together in micro-batches."""
+
+    _model: BaseEmbedding = PrivateAttr()
+    _batcher: MicroBatcher = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, max_batch_size: int = 32, max_wait: float = 0.005, **kwargs: Any):
+        """Wrap an embedding model with a query micro-batcher."""
+        super().__init__(
+            model_name=model.model_name,
+            embed_batch_size=model.embed_batch_size,
+            **kwargs
+        )
+        self._model = model
+        self._batcher = MicroBatcher(self._embed_queries, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    @property
+    def model(self) -> BaseEmbedding:
+        """The wrapped embedding model."""
+        return self._model
+
+    @property
+    def batcher(self) -> MicroBatcher:
+        """The query micro-batcher."""
+        return self._batcher
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if isinstance(self._model, OnnxEmbedding):
+            return self._model.embed_batch(queries)
+        if _is_huggingface_model(self._model):
+            # One forward pass for the whole batch, with the model's query prompt
+            return self._model._embed(queries, prompt_name="query")
+        return [self._model._get_query_embedding(query) for query in queries]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._batcher(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._model._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._model._get_text_embeddings(texts)
+
+
+class CachedQueryEmbedding(BaseEmbedding):
+    """Embedding model wrapper that serves repeated query embeddings from a cache."""
+
+    _model: BaseEmbedding = PrivateAttr()
+    _cache: QueryEmbeddingCache = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, cache: QueryEmbeddingCache, **kwargs: Any):
+        """Wrap an embedding model with a query embedding cache."""
+        super().__init__(
+            model_name=model.model_name,
+            embed_batch_size=model.embed_batch_size,
+            **kwargs
+        )
+        self._model = model
+        self._cache = cache
+
+    @property
+    def model(self) -> BaseEmbedding:
+        """The wrapped embedding model."""
+        return self._model
+
+    @property
+    def cache(self) -> QueryEmbeddingCache:
+        """The query embedding cache."""
+        return self._cache
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        embedding = self._cache.get(query)
+        if embedding is None:
+            embedding = self._model._get_query_embedding(query)
+            self._cache.put(query, embedding)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._model._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._model._get_text_embeddings(texts)
+
+
+def create_embedding_model(model_name, cache_size=1024, cache_ttl=None, cache_path=None, embed_batch_size=10,
+                           query_batch_size=0, query_batch_wait=0.005, backend="torch",
+                           onnx_file=DEFAULT_ONNX_FILE, quantize=False, threads=None):
+    """
+    Create and return an embedding model for a sentence-transformers model.
+
+    backend "torch" runs it with HuggingFaceEmbedding; "onnx" runs its ONNX
+    export with ONNX Runtime (see OnnxEmbedding), optionally int8-quantized,
+    with threads intra-op threads, and without importing torch.
+
+    embed_batch_size is the number of texts sent to the model per forward pass
+    when embedding documents.
+
+    When query_batch_size > 1, queries embedded concurrently within
+    query_batch_wait seconds of each other share one forward pass of up to
+    query_batch_size queries.
+
+    Query embeddings are served from a bounded LRU cache when cache_size > 0,
+    and persisted to cache_path on exit when a path is given.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+    if backend == "onnx":
+        model = OnnxEmbedding(model_name, onnx_file=onnx_file, quantize=quantize, threads=threads,
+                              embed_batch_size=embed_batch_size)
+    else:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        model = HuggingFaceEmbedding(model_name=model_name, embed_batch_size=embed_batch_size)
+    if query_batch_size and query_batch_size > 1:
+        model = BatchedQueryEmbedding(model, max_batch_size=query_batch_size, max_wait=query_batch_wait)
+    if not cache_size:
+        return model
+
+    cache = QueryEmbeddingCache(
+        max_size=cache_size,
+        ttl=cache_ttl,
+        path=cache_path,
+        # Quantized models produce slightly different vectors
+        model_name=f"{model_name} (int8)" if backend == "onnx" and quantize else model_name
+    )
+    if cache_path:
+        atexit.register(cache.save)
+    return CachedQueryEmbedding(model, cache)
@@ -0,0 +1,99 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item calls into batched calls.
+
+    Items submitted from any thread are queued; a dispatcher thread collects
+    up to max_batch_size items, waiting at most max_wait seconds after the
+    first one, runs batch_fn on them once and routes each result back to its
+    caller's future. With max_wait=0 only items already queued are batched.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait=0.005):
+        """
+        Initialize the batcher.
+
+        Args:
+            batch_fn (callable): Maps a list of items to a list of results in the same order
+            max_batch_size (int): Maximum items per batch_fn call
+            max_wait (float): Seconds to wait for more items after the first one arrives
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._reset()
+        # The dispatcher thread does not survive fork; workers start their own
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, item):
+        """Queue an item and return a future for its result."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Process a single item as part of the next batch and return its result."""
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                # Materialized first, so a result iterator failing partway fails the whole batch
+                results = list(self.batch_fn([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batched call returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"Batched call failed for {len(batch)} items: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Return the number of batches run and their mean size."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
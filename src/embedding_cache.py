@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from src.file_utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed on normalized query text."""
+
+    def __init__(self, max_size=1024, ttl=None, path=None, model_name=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of embeddings kept before evicting the least recently used
+            ttl (float): Seconds an entry stays valid, or None to never expire
+            path (str): Optional JSON file used to persist the cache between restarts
+            model_name (str): Embedding model the vectors belong to; a persisted cache
+                written by a different model is ignored
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path:
+            self.load()
+
+    @staticmethod
+    def normalize(text):
+        """Normalize query text so trivially different spellings share an entry."""
+        return " ".join(text.lower().split())
+
+    def _is_expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, text):
+        """Return a copy of the cached embedding for text, or None on a miss."""
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[1], now):
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # A copy, so callers normalizing or casting the vector in place cannot corrupt the entry
+            return list(entry[0])
+
+    def put(self, text, embedding):
+        """Store an embedding, evicting the least recently used entries when full."""
+        if self.max_size <= 0:
+            return
+        key = self.normalize(text)
+        with self._lock:
+            self._entries[key] = (list(embedding), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached embeddings and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def _read_file(self):
+        """Entries persisted for this model, or an empty list."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable query embedding cache {self.path}: {e}")
+            return []
+
+        if data.get("model_name") != self.model_name:
+            logger.info("Query embedding cache was built with a different model, starting empty.")
+            return []
+        return data.get("entries", [])
+
+    def load(self):
+        """Load persisted entries from disk, skipping expired ones."""
+        entries = self._read_file()
+        now = time.time()
+        with self._lock:
+            for key, embedding, created_at in entries:
+                if not self._is_expired(created_at, now):
+                    self._entries[key] = (embedding, created_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        if entries:
+            logger.info(f"Loaded {len(self._entries)} cached query embeddings from {self.path}")
+
+    def save(self):
+        """
+        Persist the current entries to disk in LRU order.
+
+        Server workers each hold their own cache and save it as they exit, so
+        entries saved by other processes meanwhile are kept (as least recently
+        used) rather than overwritten; the file is locked while merging.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            entries = OrderedDict(self._entries)
+
+        with file_lock(f"{self.path}.lock"):
+            merged = OrderedDict(
+                (key, (embedding, created_at)) for key, embedding, created_at in self._read_file()
+                if key not in entries
+            )
+            merged.update(entries)
+            while len(merged) > self.max_size:
+                merged.popitem(last=False)
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "model_name": self.model_name,
+                    "entries": [[key, embedding, created_at] for key, (embedding, created_at) in merged.items()],
+                }, f)
+            os.replace(tmp_path, self.path)
+        logger.debug(f"Saved {len(merged)} query embeddings to {self.path}")
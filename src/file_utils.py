@@ -1,51 +1,167 @@
 import os
 import json
 import hashlib
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
-def hash_file(file_path):
-    """Generate MD5 hash of file contents."""
+try:
+    import fcntl
+except ImportError:  # Windows, where the server runs a single process
+    fcntl = None
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path, created if needed, against other processes; a no-op without fcntl."""
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Closing the file releases the lock
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def hash_file(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """Generate MD5 hash of file contents, reading the file in fixed-size chunks."""
+    md5 = hashlib.md5()
     with open(file_path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
 
-def load_file_hashes(file_hashes_path):
-    """Load file hashes from stored file."""
+def load_file_manifest(file_hashes_path):
+    """
+    Load the file manifest as {path: (hash, size, mtime_ns)}.
+
+    Lines are "path,hash,size,mtime_ns"; legacy "path,hash" lines load with
+    size and mtime set to None so those files are re-hashed once.
+    """
     if not os.path.exists(file_hashes_path):
         return {}
+    manifest = {}
     with open(file_hashes_path, "r") as f:
-        return dict(line.strip().split(",") for line in f if "," in line)
+        for line in f:
+            line = line.strip()
+            if "," not in line:
+                continue
+            parts = line.rsplit(",", 3)
+            if len(parts) == 4 and parts[2].isdigit() and parts[3].isdigit():
+                path, h, size, mtime_ns = parts
+                manifest[path] = (h, int(size), int(mtime_ns))
+            else:
+                path, h = line.rsplit(",", 1)
+                manifest[path] = (h, None, None)
+    return manifest
 
-def save_file_hashes(file_hashes_path, hashes):
-    """Save file hashes to file."""
+def load_file_hashes(file_hashes_path):
+    """Load file hashes from stored file."""
+    return {path: entry[0] for path, entry in load_file_manifest(file_hashes_path).items()}
+
+def save_file_hashes(file_hashes_path, manifest):
+    """Save the file manifest (hash, size and mtime per path) to file."""
     with open(file_hashes_path, "w") as f:
-        for path, h in hashes.items():
-            f.write(f"{path},{h}\n")
+        for path, (h, size, mtime_ns) in manifest.items():
+            f.write(f"{path},{h},{size},{mtime_ns}\n")
+
+def get_documents_to_index(data_dir, file_hashes_path, max_workers=8):
+    """
+    Identify documents that need to be indexed (new or changed).
+
+    Files whose size and mtime match the stored manifest are trusted without
+    hashing; the rest are hashed in parallel on a thread pool.
 
-def get_documents_to_index(data_dir, file_hashes_path):
-    """Identify documents that need to be indexed (new or changed)."""
-    old_hashes = load_file_hashes(file_hashes_path)
-    new_hashes = {}
+    Returns:
+        tuple: (paths to index, new manifest to pass to save_file_hashes)
+    """
+    old_manifest = load_file_manifest(file_hashes_path)
+    new_manifest = {}
     documents_to_index = []
+    to_hash = []
 
-    for fname in os.listdir(data_dir):
-        path = os.path.join(data_dir, fname)
-        if os.path.isfile(path):
-            h = hash_file(path)
-            new_hashes[path] = h
-            if old_hashes.get(path) != h:
-                documents_to_index.append(path)
-                
-    return documents_to_index, new_hashes
+    for entry in os.scandir(data_dir):
+        if not entry.is_file():
+            continue
+        path = os.path.join(data_dir, entry.name)
+        stat = entry.stat()
+        previous = old_manifest.get(path)
+        if previous and previous[1] == stat.st_size and previous[2] == stat.st_mtime_ns:
+            new_manifest[path] = previous
+        else:
+            to_hash.append((path, stat))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hashes = executor.map(hash_file, [path for path, _ in to_hash])
+            for (path, stat), h in zip(to_hash, hashes):
+                new_manifest[path] = (h, stat.st_size, stat.st_mtime_ns)
+                previous = old_manifest.get(path)
+                if previous is None or previous[0] != h:
+                    documents_to_index.append(path)
+
+    return documents_to_index, new_manifest
+
+def load_conversation_log(path):
+    """
+    Load conversation history and its trimmed-turn offset, or ([], 0) if the file doesn't exist.
+
+    The file holds one JSON record per line, optionally preceded by a
+    {"dropped_turns": n} header written when older turns were trimmed; a legacy
+    file holding a single JSON array is also accepted. Lines that fail to
+    parse (e.g. a torn final write) are skipped.
+
+    Returns:
+        tuple: (list of turns, number of turns trimmed before the first one)
+    """
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, "r") as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        return json.loads(content), 0
+
+    history = []
+    dropped = 0
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not history and "dropped_turns" in record and "question" not in record:
+            dropped = record["dropped_turns"]
+            continue
+        history.append(record)
+    return history, dropped
 
 def load_conversation_history(path):
-    """Load conversation history from a JSON file if it exists, else return an empty list."""
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            return json.load(f)
-    return []
-
-def save_conversation_history(path, history):
-    """Save conversation history to a JSON file, creating the file if it doesn't exist."""
+    """Load conversation history if the file exists, else return an empty list."""
+    return load_conversation_log(path)[0]
+
+def append_conversation_turn(path, turn):
+    """Append a single conversation turn to a JSONL history file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "a") as f:
+        f.write(json.dumps(turn) + "\n")
+
+def save_conversation_history(path, history, dropped=0):
+    """
+    Rewrite a JSONL history file with the given turns, creating it if it doesn't exist.
+
+    A non-zero dropped count of turns trimmed before the first one is kept in a
+    header line, so every process reloading the file agrees on turn numbers.
+    """
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
-    with open(path, "w") as f:
-        json.dump(history, f, indent=2)
\ No newline at end of file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        if dropped:
+            f.write(json.dumps({"dropped_turns": dropped}) + "\n")
+        for turn in history:
+            f.write(json.dumps(turn) + "\n")
+    os.replace(tmp_path, path)
@@ -1,98 +1,340 @@
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from llama_index.core import (
+    Settings,
     StorageContext,
     VectorStoreIndex,
-    load_index_from_storage,
-    SimpleDirectoryReader
+    load_index_from_storage
 )
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores import SimpleVectorStore
+from src.document_loader import iter_documents
+from src.vector_store import MmapVectorStore
+from src.document_catalog import DocumentCatalog
+from src.text_cleaner import TextCleaner, CLEANED_METADATA_KEY
+from src import telemetry
 from src.exception_handler import handle_exceptions, IndexingError
 
 logger = logging.getLogger(__name__)
 
+CATALOG_FILENAME = "document_catalog.json"
+
 class IndexManager:
     """Manager for document index operations."""
-    
-    def __init__(self, persist_dir, embed_model):
-        """Initialize with storage directory and embedding model."""
+
+    def __init__(self, persist_dir, embed_model, embed_batch_size=None, embed_workers=1, parse_workers=None,
+                 vector_store="mmap", vector_dtype="float32", ann_index="none", ann_options=None,
+                 progress=None, cleaner=None, rescore_factor=0):
+        """
+        Initialize with storage directory and embedding model.
+
+        Args:
+            persist_dir (str): Directory the index is persisted to
+            embed_model: Embedding model used for documents and queries
+            embed_batch_size (int): Nodes per embedding call during ingestion;
+                defaults to the model's embed_batch_size
+            embed_workers (int): Number of embedding batches run concurrently
+            parse_workers (int): Processes used to parse documents; defaults to the CPU count
+            vector_store (str): "mmap" for the memory-mapped NumPy store, "simple" for
+                llama_index's JSON store
+            vector_dtype (str): "float32", "float16" or "int8" storage for the mmap store
+            ann_index (str): "ivf" to enable approximate search in the mmap store, or "none"
+            ann_options (dict): IVF settings (ivf_nlist, ivf_nprobe, ivf_min_rows)
+            progress (callable): Called as progress(files_done, files_total) during ingestion
+            cleaner (TextCleaner): Cleans node text once at ingestion; defaults to TextCleaner()
+            rescore_factor (int): With a quantized vector_dtype, re-rank top_k * rescore_factor
+                candidates by full-precision vectors; 0 disables rescoring
+        """
         self.persist_dir = persist_dir
         self.embed_model = embed_model
+        self.embed_batch_size = embed_batch_size or embed_model.embed_batch_size
+        self.embed_workers = max(1, embed_workers)
+        self.parse_workers = parse_workers
+        self.vector_store = vector_store
+        self.vector_dtype = vector_dtype
+        self.vector_store_options = {"ann": ann_index, "rescore_factor": rescore_factor or 0, **(ann_options or {})}
+        if ann_index != "none" and vector_store != "mmap":
+            logger.warning(f"ANN index '{ann_index}' requires the mmap vector store; using exact search.")
+        self.progress = progress
+        self.cleaner = cleaner or TextCleaner()
+        self.last_ingest_stats = {}
+        # Files of the last ingestion that could not be parsed and were left out of the index
+        self.failed_files = []
+        self.catalog_path = os.path.join(persist_dir, CATALOG_FILENAME)
+        # Nodes, pages and hash of every indexed file
+        self.catalog = DocumentCatalog()
+        # file_path -> content hash of the files being indexed, recorded in the catalog
+        self.file_hashes = {}
+        self.modified = False
         logger.debug(f"IndexManager initialized with persist_dir: {persist_dir}")
-    
+
+    @property
+    def index_version(self):
+        """Identifier of the indexed content; changes whenever files are inserted or deleted."""
+        return self.catalog.version
+
+    def _load_catalog(self, index):
+        """Load the document catalog, rebuilding it from the docstore for older indexes."""
+        if os.path.exists(self.catalog_path):
+            self.catalog = DocumentCatalog.load(self.catalog_path)
+        else:
+            logger.info("No document catalog found, rebuilding it from the docstore...")
+            self.catalog = DocumentCatalog.from_docstore(index.docstore)
+            self.modified = True
+        if self.catalog.set_hashes(self.file_hashes):
+            self.modified = True
+
+    def _new_storage_context(self):
+        """Storage context for a brand-new index using the configured vector store."""
+        if self.vector_store == "mmap":
+            return StorageContext.from_defaults(
+                vector_store=MmapVectorStore(dtype=self.vector_dtype, **self.vector_store_options)
+            )
+        return StorageContext.from_defaults()
+
+    def _load_storage_context(self):
+        """Storage context for the persisted index using the configured vector store."""
+        if self.vector_store == "mmap":
+            return StorageContext.from_defaults(
+                persist_dir=self.persist_dir,
+                vector_store=MmapVectorStore.from_persist_dir(
+                    self.persist_dir, dtype=self.vector_dtype, **self.vector_store_options
+                )
+            )
+        return StorageContext.from_defaults(persist_dir=self.persist_dir)
+
+    def _embed_texts(self, texts):
+        """Embed texts in batches of embed_batch_size, running up to embed_workers batches at once."""
+        batches = [texts[i:i + self.embed_batch_size] for i in range(0, len(texts), self.embed_batch_size)]
+        if self.embed_workers == 1 or len(batches) <= 1:
+            results = [self.embed_model.get_text_embedding_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.embed_workers) as executor:
+                results = list(executor.map(self.embed_model.get_text_embedding_batch, batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def _clean_nodes(self, nodes):
+        """Clean node text once so the query path can use it as stored."""
+        for node in nodes:
+            node.set_content(self.cleaner.clean_text(node.get_content()))
+            node.metadata[CLEANED_METADATA_KEY] = True
+            # Node parsers may share these lists between the nodes of a document
+            for excluded in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+                if CLEANED_METADATA_KEY not in excluded:
+                    excluded.append(CLEANED_METADATA_KEY)
+
+    def build_nodes(self, documents):
+        """
+        Chunk all documents into nodes and clean their text, then embed the nodes in large batches.
+
+        Returns:
+            tuple: (nodes with their embeddings set, chunking seconds, embedding seconds)
+        """
+        start_time = time.time()
+        with telemetry.span("index.chunk"):
+            nodes = Settings.node_parser.get_nodes_from_documents(documents)
+        with telemetry.span("index.clean_text"):
+            self._clean_nodes(nodes)
+        chunk_duration = time.time() - start_time
+
+        embed_start = time.time()
+        with telemetry.span("index.embed"):
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+            for node, embedding in zip(nodes, self._embed_texts(texts)):
+                node.embedding = embedding
+        embed_duration = time.time() - embed_start
+
+        return nodes, chunk_duration, embed_duration
+
+    def _insert_documents(self, index, documents):
+        """Chunk, embed and insert a group of loaded pages, recording their nodes."""
+        nodes, chunk_duration, embed_duration = self.build_nodes(documents)
+        with telemetry.span("index.insert"):
+            index.insert_nodes(nodes)
+            for doc in documents:
+                index.docstore.set_document_hash(doc.id_, doc.hash)
+            self.catalog.add_nodes(nodes, self.file_hashes)
+        telemetry.increment("qa_index_nodes_total", len(nodes))
+
+        stats = self.last_ingest_stats
+        stats["pages"] += len(documents)
+        stats["nodes"] += len(nodes)
+        stats["chunk_duration"] += chunk_duration
+        stats["embed_duration"] += embed_duration
+
+    def ingest_files(self, index, paths):
+        """
+        Parse files on a process pool and stream their pages into the embedding stage.
+
+        Pages are buffered only until a full embedding batch is available, so the
+        whole corpus is never held in memory at once. Files that fail to parse
+        get no catalog entry and are listed in failed_files.
+        """
+        start_time = time.time()
+        self.last_ingest_stats = {"files": len(paths), "pages": 0, "nodes": 0, "chunk_duration": 0.0, "embed_duration": 0.0}
+        self.failed_files = []
+
+        pending = []
+        files_parsed = 0
+        for path, documents in iter_documents(paths, self.parse_workers):
+            files_parsed += 1
+            if documents is None:
+                self.failed_files.append(path)
+                continue
+            pending.extend(documents)
+            if len(pending) >= self.embed_batch_size:
+                self._insert_documents(index, pending)
+                pending = []
+                if self.progress:
+                    self.progress(files_parsed, len(paths))
+        if pending:
+            self._insert_documents(index, pending)
+        if self.progress:
+            self.progress(len(paths), len(paths))
+
+        telemetry.increment("qa_index_files_total", len(paths))
+        stats = self.last_ingest_stats
+        stats["failed_files"] = len(self.failed_files)
+        stats["total_duration"] = time.time() - start_time
+        stats["nodes_per_second"] = stats["nodes"] / stats["embed_duration"] if stats["embed_duration"] > 0 else 0.0
+        self.modified = True
+        logger.info(f"Loaded {stats['pages']} document pages from {len(paths)} documents.")
+        if self.failed_files:
+            logger.warning(f"{len(self.failed_files)} documents could not be parsed and will be retried on the next indexing run.")
+        logger.info(
+            f"Embedded {stats['nodes']} nodes in {stats['embed_duration']:.2f} seconds "
+            f"({stats['nodes_per_second']:.1f} nodes/sec, batch size {self.embed_batch_size}, "
+            f"{self.embed_workers} embed workers); ingestion took {stats['total_duration']:.2f} seconds"
+        )
+
+    def _delete_nodes(self, index, node_ids, ref_doc_ids):
+        """Remove nodes from the vector store, index struct and docstore by ID."""
+        vector_store = index.vector_store
+        if isinstance(vector_store, SimpleVectorStore):
+            # SimpleVectorStore.delete_nodes scans every stored embedding; pop by key instead
+            data = vector_store.data
+            for node_id in node_ids:
+                data.embedding_dict.pop(node_id, None)
+                data.text_id_to_ref_doc_id.pop(node_id, None)
+                if data.metadata_dict is not None:
+                    data.metadata_dict.pop(node_id, None)
+        else:
+            vector_store.delete_nodes(node_ids)
+
+        for node_id in node_ids:
+            index.index_struct.nodes_dict.pop(node_id, None)
+        for ref_doc_id in ref_doc_ids:
+            index.docstore.delete_ref_doc(ref_doc_id, raise_error=False)
+
+    def delete_file(self, index, file_path):
+        """Delete every node that was created from file_path."""
+        entry = self.catalog.remove(file_path)
+        if not entry:
+            return
+        self._delete_nodes(index, entry["node_ids"], entry["ref_doc_ids"])
+        self.modified = True
+        logger.debug(f"Deleted {len(entry['node_ids'])} nodes for {file_path}")
+
     @handle_exceptions
     def create_new_index(self, documents_to_index):
         """Create a new index from specified documents."""
         if not documents_to_index:
             logger.warning("No documents found to create index.")
-            return VectorStoreIndex([], embed_model=self.embed_model)
-            
+            return VectorStoreIndex([], embed_model=self.embed_model, storage_context=self._new_storage_context())
+
         logger.info("Creating new index...")
         logger.info(f"Processing {len(documents_to_index)} documents...")
-        
-        try:
-            reader = SimpleDirectoryReader(
-                input_files=documents_to_index,
-                file_metadata=lambda fname: {"file_path": fname}
-            )
-            documents = reader.load_data()
-            logger.info(f"Loaded {len(documents)} document pages from {len(documents_to_index)} documents.")
 
+        try:
             logger.info("Building index from documents...")
-            index = VectorStoreIndex.from_documents(documents, embed_model=self.embed_model)
+            index = VectorStoreIndex([], embed_model=self.embed_model, storage_context=self._new_storage_context())
+            self.catalog = DocumentCatalog()
+            self.ingest_files(index, documents_to_index)
             logger.info("Index successfully built.")
-            
+
             return index
         except Exception as e:
             raise IndexingError("Failed to create new index", e)
-    
+
     @handle_exceptions
-    def update_existing_index(self, index, documents_to_index):
-        """Update existing index with new or changed documents."""
-        if not documents_to_index:
+    def update_existing_index(self, index, documents_to_index, removed_documents=()):
+        """
+        Update existing index with new, changed and removed documents.
+
+        Nodes from the previous version of a changed file, and from files that
+        were removed, are deleted before the new nodes are inserted.
+        """
+        if not documents_to_index and not removed_documents:
             logger.info("No new/changed documents.")
             return index
-            
-        logger.info(f"Found {len(documents_to_index)} new/changed documents, updating index...")
+
         try:
-            reader = SimpleDirectoryReader(
-                input_files=documents_to_index,
-                file_metadata=lambda fname: {"file_path": fname}
-            )
-            new_documents = reader.load_data()
-            logger.info(f"Loaded {len(new_documents)} new/changed document pages from {len(documents_to_index)} documents.")
+            for path in removed_documents:
+                self.delete_file(index, path)
+            if removed_documents:
+                logger.info(f"Removed {len(removed_documents)} deleted documents from the index.")
+
+            if not documents_to_index:
+                index.storage_context.index_store.add_index_struct(index.index_struct)
+                return index
+
+            logger.info(f"Found {len(documents_to_index)} new/changed documents, updating index...")
+            for path in documents_to_index:
+                self.delete_file(index, path)
 
             logger.info("Inserting documents into the index...")
-            for doc in new_documents:
-                index.insert(doc)
+            self.ingest_files(index, documents_to_index)
             logger.info("Documents inserted successfully")
-            
+
             return index
         except Exception as e:
             raise IndexingError("Failed to update existing index", e)
-    
+
     @handle_exceptions
-    def get_or_create_index(self, documents_to_index):
-        """Load existing index or create new one if needed."""
+    def get_or_create_index(self, documents_to_index, current_documents=None, file_hashes=None):
+        """
+        Load existing index or create new one if needed.
+
+        When current_documents (every file now in the data directory) is given,
+        indexed files missing from it are removed from the index. file_hashes
+        maps file paths to their content hash for the document catalog.
+        """
+        self.file_hashes = file_hashes or {}
         if os.path.exists(self.persist_dir):
             logger.info("Loading existing index...")
             try:
-                storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir)
+                storage_context = self._load_storage_context()
                 index = load_index_from_storage(storage_context, embed_model=self.embed_model)
-                
-                index = self.update_existing_index(index, documents_to_index)
+                self._load_catalog(index)
+
+                removed_documents = []
+                if current_documents is not None:
+                    current_documents = set(current_documents)
+                    removed_documents = [path for path in self.catalog.paths if path not in current_documents]
+
+                index = self.update_existing_index(index, documents_to_index, removed_documents)
             except Exception as e:
                 raise IndexingError("Failed to load existing index", e)
         else:
             index = self.create_new_index(documents_to_index)
-        
+
+        if isinstance(index.vector_store, MmapVectorStore):
+            index.vector_store.prepare()
+            # Conversions on load (legacy JSON, another dtype) and a newly trained IVF index are written once
+            if index.vector_store.dirty:
+                self.modified = True
         return index
-    
+
     @handle_exceptions
     def save_index(self, index):
-        """Save index to persistent storage."""
+        """Save index and its document catalog to persistent storage."""
         logger.info("Saving index to storage...")
         try:
             index.storage_context.persist(persist_dir=self.persist_dir)
+            self.catalog.save(self.catalog_path)
+            self.modified = False
             logger.info("Index successfully saved.")
         except Exception as e:
-            raise IndexingError("Failed to save index", e)
\ No newline at end of file
+            raise IndexingError("Failed to save index", e)
@@ -1,57 +1,174 @@
+import time
+import threading
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
 
-from config import get_config
-from src.file_utils import load_conversation_history
+from src.conversation_history import ConversationHistory
+from src.conversation_summary import RollingSummary, format_turns
+from src.session_store import ConversationSession, DEFAULT_SESSION_ID
+from src import telemetry
 
 class LLMInterface:
     """Interface for language model interactions."""
     
-    def __init__(self, model_name, temperature=0.3):
-        """Initialize the LLM with specified parameters."""
+    def __init__(self, model_name, temperature=0.3, response_cache=None, default_session=None):
+        """
+        Initialize the LLM with specified parameters.
+
+        Args:
+            model_name (str): Groq model name
+            temperature (float): Sampling temperature
+            response_cache (LLMResponseCache): Cache byte-identical prompts are answered
+                from, or None to always call the LLM
+            default_session (ConversationSession): Conversation used by the prompt builders
+                when no session is given; defaults to an empty in-memory one
+        """
         self.llm = ChatGroq(temperature=temperature, model_name=model_name)
+        self.model_name = model_name
+        self.temperature = temperature
 
-        self.config = get_config()
+        self.response_cache = response_cache
+        # Cache hits and LLM calls are timed separately so hits don't skew LLM latency
+        self.latency = {"cache_hit": [0, 0.0], "llm_call": [0, 0.0]}
+        self._latency_lock = threading.Lock()
 
-        self.general_history_path = self.config["general_history_path"]
-        self.source_history_path = self.config["source_history_path"]
+        self.default_session = default_session or ConversationSession(
+            DEFAULT_SESSION_ID, ConversationHistory(None), ConversationHistory(None), RollingSummary(None)
+        )
     
-    def get_response(self, prompt):
-        """Get response from LLM for a given prompt."""
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        return response.content.strip()
+    def _record_latency(self, kind, start):
+        with self._latency_lock:
+            entry = self.latency[kind]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+
+    def _cached_response(self, prompt, use_cache):
+        """Return the cached response for prompt, or None on a miss or when caching is off."""
+        if not use_cache or self.response_cache is None:
+            return None
+        start = time.perf_counter()
+        response = self.response_cache.get(self.model_name, self.temperature, prompt)
+        if response is not None:
+            self._record_latency("cache_hit", start)
+            telemetry.increment("qa_llm_requests_total", source="cache")
+        return response
+
+    def _store_response(self, prompt, response, use_cache):
+        if use_cache and self.response_cache is not None:
+            self.response_cache.put(self.model_name, self.temperature, prompt, response)
+
+    @staticmethod
+    def _count_call(message):
+        """Count an LLM call and the tokens the provider reported for it."""
+        telemetry.increment("qa_llm_requests_total", source="llm")
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            telemetry.increment("qa_llm_tokens_total", usage.get("input_tokens", 0), direction="input")
+            telemetry.increment("qa_llm_tokens_total", usage.get("output_tokens", 0), direction="output")
+
+    def latency_stats(self):
+        """Counts and mean latencies of cache hits and LLM calls, plus the cache hit rate."""
+        with self._latency_lock:
+            (hits, hit_total), (calls, call_total) = self.latency["cache_hit"], self.latency["llm_call"]
+        return {
+            "cache_hits": hits,
+            "llm_calls": calls,
+            "cache_hit_rate": hits / (hits + calls) if hits + calls else 0.0,
+            "avg_cache_hit_ms": hit_total / hits * 1000 if hits else 0.0,
+            "avg_llm_call_ms": call_total / calls * 1000 if calls else 0.0,
+        }
+
+    def get_response(self, prompt, use_cache=True):
+        """
+        Get response from LLM for a given prompt.
+
+        Identical prompts are served from the response cache unless use_cache is False.
+        """
+        cached = self._cached_response(prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        with telemetry.span("llm.call"):
+            message = self.llm.invoke([HumanMessage(content=prompt)])
+        self._record_latency("llm_call", start)
+        self._count_call(message)
+        response = message.content.strip()
+        self._store_response(prompt, response, use_cache)
+        return response
     
-    def get_source_based_summary(self, question, source_texts):
-        """Generate a summary based on provided sources and question."""
+    def summarize_turns(self, previous_summary, turns):
+        """Fold new conversation turns into an existing summary with one LLM call."""
+        if not previous_summary:
+            return self.get_response(f"Summarize this previous conversation:\n{format_turns(turns)}")
+        return self.get_response(
+            "Update the summary of an earlier conversation with the new exchanges below. "
+            "Keep it concise.\n\n"
+            f"Current summary:\n{previous_summary}\n\n"
+            f"New exchanges:\n{format_turns(turns)}"
+        )
+
+    def stream_response(self, prompt, use_cache=True):
+        """
+        Yield the LLM response for a prompt token by token as it is generated.
+
+        A cached response is yielded whole; a freshly streamed one is cached once complete.
+        """
+        cached = self._cached_response(prompt, use_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        started = False
+        tokens = []
+        usage_chunk = None
+        with telemetry.span("llm.stream"):
+            for chunk in self.llm.stream([HumanMessage(content=prompt)]):
+                if getattr(chunk, "usage_metadata", None):
+                    usage_chunk = chunk
+                token = chunk.content
+                if not started:
+                    # Match get_response, which strips leading whitespace
+                    token = token.lstrip()
+                    started = bool(token)
+                if token:
+                    tokens.append(token)
+                    yield token
+        self._record_latency("llm_call", start)
+        self._count_call(usage_chunk)
+        self._store_response(prompt, "".join(tokens).strip(), use_cache)
+
+    def build_source_prompt(self, question, source_texts, session=None):
+        """Build the source-based summary prompt, or return None when there are no sources."""
         if not source_texts:
-            return "No relevant content found."
-        
-        else:
-            source_conversation_history = load_conversation_history(self.source_history_path)
-            combined_texts = "\n\n".join(source_texts)
-
-            if source_conversation_history:
-                if len(source_conversation_history) > 10:
-                    long_history = source_conversation_history[:-5]
-                    recent_history = source_conversation_history[-5:]
-
-                    summary_prompt = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in long_history])
-                    summary_response = self.llm.invoke([
-                        HumanMessage(content=f"Summarize this previous conversation:\n{summary_prompt}")
-                    ])
-                    history_summary = summary_response.content.strip()
-
-                    source_context = (
-                        f"Summary of earlier conversation:\n{history_summary}\n\n"
-                        f"Recent conversation:\n" +
-                        "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in recent_history])
-                    )
-                else:
-                    source_context = "\n".join(
-                        [f"Q: {qa['question']}\nA: {qa['answer']}" for qa in source_conversation_history]
+            return None
+
+        session = session or self.default_session
+        source_conversation_history = session.source_history
+        combined_texts = "\n\n".join(source_texts)
+
+        if source_conversation_history:
+            if len(source_conversation_history) > 10:
+                long_history = source_conversation_history[:-5]
+                recent_history = source_conversation_history.tail(5)
+
+                with telemetry.span("llm.history_summary"):
+                    history_summary = session.source_summary.get_summary(
+                        long_history, self.summarize_turns, first_index=source_conversation_history.dropped
                     )
 
-                source_prompt = f"""
+                source_context = (
+                    f"Summary of earlier conversation:\n{history_summary}\n\n"
+                    f"Recent conversation:\n" +
+                    format_turns(recent_history)
+                )
+            else:
+                source_context = "\n".join(
+                    [f"Q: {qa['question']}\nA: {qa['answer']}" for qa in source_conversation_history]
+                )
+
+            source_prompt = f"""
     Conversation so far:
     {source_context}
 
@@ -60,25 +177,47 @@ class LLMInterface:
     TEXT SOURCES:
     {combined_texts}
     """
-            else:
-                source_prompt = f"""
+        else:
+            source_prompt = f"""
     Based ONLY on the following text sources, provide a concise summary that answers the question: "{question}"
 
     TEXT SOURCES:
     {combined_texts}
     """
-    
-        return self.get_response(source_prompt)
-    
-    def get_general_answer(self, question):
-        """Generate a general answer to the question without specific sources."""
+        return source_prompt
+
+    def build_general_prompt(self, question, session=None):
+        """Build the general answer prompt from the recent general conversation."""
         # prompt = f"Answer this question generally: {question}"
-        general_conversation_history = load_conversation_history(self.general_history_path)
+        general_conversation_history = (session or self.default_session).general_history
         if general_conversation_history:
             general_context = "\n".join(
-                [f"Q: {qa['question']}\nA: {qa['answer']}" for qa in general_conversation_history[-5:]]
+                [f"Q: {qa['question']}\nA: {qa['answer']}" for qa in general_conversation_history.tail(5)]
             )
-            combined_prompt = f"Conversation so far:\n{general_context}\nQ: {question}\nA:"
-        else:
-            combined_prompt = f"Q: {question}\nA:"
-        return self.get_response(combined_prompt)
\ No newline at end of file
+            return f"Conversation so far:\n{general_context}\nQ: {question}\nA:"
+        return f"Q: {question}\nA:"
+
+    def get_source_based_summary(self, question, source_texts, session=None):
+        """Generate a summary based on provided sources and question."""
+        source_prompt = self.build_source_prompt(question, source_texts, session)
+        if source_prompt is None:
+            return "No relevant content found."
+        with telemetry.span("llm.source_summary"):
+            return self.get_response(source_prompt)
+
+    def stream_source_based_summary(self, question, source_texts, session=None):
+        """Yield the source-based summary token by token."""
+        source_prompt = self.build_source_prompt(question, source_texts, session)
+        if source_prompt is None:
+            yield "No relevant content found."
+            return
+        yield from self.stream_response(source_prompt)
+
+    def get_general_answer(self, question, session=None):
+        """Generate a general answer to the question without specific sources."""
+        with telemetry.span("llm.general_answer"):
+            return self.get_response(self.build_general_prompt(question, session))
+
+    def stream_general_answer(self, question, session=None):
+        """Yield the general answer token by token."""
+        yield from self.stream_response(self.build_general_prompt(question, session))
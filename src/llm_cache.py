@@ -0,0 +1,107 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of LLM responses keyed on model name, temperature and prompt hash.
+
+    Entries live in a SQLite database so they survive restarts. Lookups are a
+    single primary-key read; the oldest entries are evicted once max_entries is
+    exceeded and entries older than ttl are ignored and purged.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=10000):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): SQLite database file
+            ttl (float): Seconds an entry stays valid, or None to never expire
+            max_entries (int): Maximum number of cached responses
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect()
+        self.purge_expired()
+
+        # SQLite connections must not be shared with forked server workers
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self):
+        """Open this process's connection to the database, creating the table if needed."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, temperature, prompt):
+        """Cache key of a prompt sent to a model at a temperature."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model_name}:{temperature}:{digest}"
+
+    def get(self, model_name, temperature, prompt):
+        """Return the cached response, or None on a miss or when the entry has expired."""
+        key = self.make_key(model_name, temperature, prompt)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def put(self, model_name, temperature, prompt, response):
+        """
+        Store a response, evicting the oldest entries when the cache is full.
+
+        The bound is applied to the table itself, which every server worker
+        writes to, rather than to a count kept by this process.
+        """
+        key = self.make_key(model_name, temperature, prompt)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                (key, model_name, response, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)", (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        """Delete entries older than the TTL."""
+        if self.ttl is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+    def clear(self):
+        """Delete every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,162 @@
+import os
+import json
+import logging
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_FILE = "onnx/model.onnx"
+
+# Used when the model ships no sentence_bert_config.json
+DEFAULT_MAX_LENGTH = 512
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    Sentence-transformers model run through ONNX Runtime on the CPU.
+
+    Loads the ONNX export and tokenizer.json of a Hub model (or local model
+    directory) and applies the model's pooling and L2 normalization itself,
+    so neither torch nor sentence-transformers is imported. Query prompts are
+    not applied, matching models such as all-MiniLM-L6-v2 that define none.
+    """
+
+    onnx_file: str = Field(default=DEFAULT_ONNX_FILE, description="ONNX file within the model repository.")
+    quantize: bool = Field(default=False, description="Run a dynamically int8-quantized copy of the model.")
+    max_length: int = Field(default=DEFAULT_MAX_LENGTH, description="Maximum tokens per text.")
+    pooling: str = Field(default="mean", description="Token pooling: mean or cls.")
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+    _input_names: set = PrivateAttr()
+
+    def __init__(self, model_name: str, onnx_file: str = DEFAULT_ONNX_FILE, quantize: bool = False,
+                 threads: Optional[int] = None, embed_batch_size: int = 10, **kwargs: Any):
+        """
+        Load the ONNX model and tokenizer of model_name.
+
+        Args:
+            model_name (str): Hub model ID or local model directory
+            onnx_file (str): Path of the ONNX export within the model, e.g. one of the
+                pre-quantized onnx/model_qint8_*.onnx files
+            quantize (bool): Quantize the model's weights to int8 on first use and run that copy
+            threads (int): ONNX Runtime intra-op threads; defaults to the runtime's choice
+            embed_batch_size (int): Texts per forward pass when embedding documents
+        """
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The onnx embedding backend requires onnxruntime and tokenizers: "
+                "pip install onnxruntime tokenizers"
+            ) from e
+
+        model_path = self._resolve(model_name, onnx_file)
+        if quantize:
+            model_path = self._quantized(model_path)
+        max_length, pooling = self._sentence_config(model_name)
+        super().__init__(
+            model_name=model_name,
+            embed_batch_size=embed_batch_size,
+            onnx_file=onnx_file,
+            quantize=quantize,
+            max_length=max_length,
+            pooling=pooling,
+            **kwargs
+        )
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+
+        tokenizer = Tokenizer.from_file(self._resolve(model_name, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.max_length)
+        # Pad each batch to its longest sequence, overriding any fixed length in
+        # tokenizer.json that would pad past max_length or leave ragged rows
+        padding = tokenizer.padding or {}
+        tokenizer.enable_padding(
+            direction=padding.get("direction", "right"),
+            pad_id=padding.get("pad_id", 0),
+            pad_type_id=padding.get("pad_type_id", 0),
+            pad_token=padding.get("pad_token", "[PAD]"),
+        )
+        self._tokenizer = tokenizer
+        logger.info(f"Loaded ONNX embedding model {model_name} ({os.path.basename(model_path)})")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    @staticmethod
+    def _resolve(model_name, filename):
+        """Local path of a model file, downloading it from the Hub when needed."""
+        if os.path.isdir(model_name):
+            return os.path.join(model_name, filename)
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(model_name, filename)
+
+    @classmethod
+    def _sentence_config(cls, model_name):
+        """(max_length, pooling) from the model's sentence-transformers configuration, if any."""
+        max_length, pooling = DEFAULT_MAX_LENGTH, "mean"
+        try:
+            with open(cls._resolve(model_name, "sentence_bert_config.json")) as f:
+                max_length = json.load(f).get("max_seq_length") or max_length
+            with open(cls._resolve(model_name, "1_Pooling/config.json")) as f:
+                if json.load(f).get("pooling_mode_cls_token"):
+                    pooling = "cls"
+        except Exception as e:
+            logger.debug(f"No sentence-transformers config for {model_name} ({e}); using defaults")
+        return max_length, pooling
+
+    @staticmethod
+    def _quantized(model_path):
+        """Path of a dynamically int8-quantized copy of model_path, created on first use."""
+        quantized_path = f"{os.path.splitext(model_path)[0]}_dynamic_qint8.onnx"
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info(f"Quantizing {model_path} to int8...")
+            tmp_path = f"{quantized_path}.tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one forward pass and return L2-normalized vectors."""
+        encodings = self._tokenizer.encode_batch(texts)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self._session.run(
+            None, {name: value for name, value in inputs.items() if name in self._input_names}
+        )[0]
+
+        if self.pooling == "cls":
+            embeddings = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (embeddings / norms).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.embed_batch([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_batch(texts)
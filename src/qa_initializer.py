@@ -0,0 +1,126 @@
+import time
+import logging
+from threading import Condition, Thread
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+LOADING_MODEL = "loading_model"
+SCANNING_FILES = "scanning_files"
+INDEXING = "indexing"
+READY = "ready"
+FAILED = "failed"
+
+# Overall progress percentage covered by each warm-up stage
+STAGE_PROGRESS = {
+    IDLE: (0, 0),
+    LOADING_MODEL: (0, 10),
+    SCANNING_FILES: (10, 20),
+    INDEXING: (20, 100),
+    READY: (100, 100),
+    FAILED: (0, 0),
+}
+
+class QAInitializer:
+    """
+    Single-flight initializer for the QA system.
+
+    The first call to start() builds the system on a background thread; later
+    calls, and requests that arrive during warm-up, wait on the same build
+    instead of starting another one. A failed build can be retried by calling
+    start() again.
+    """
+
+    def __init__(self, factory):
+        """
+        Initialize with the callable that builds the QA system.
+
+        Args:
+            factory (callable): Called as factory(progress=callback); the callback
+                takes (stage, done=None, total=None)
+        """
+        self.factory = factory
+        self.state = IDLE
+        self.progress = 0.0
+        self.detail = ""
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        self._system = None
+        self._condition = Condition()
+
+    def start(self):
+        """Start building the QA system unless a build is running or has succeeded."""
+        with self._condition:
+            if self.state not in (IDLE, FAILED):
+                return False
+            self._set_stage(LOADING_MODEL)
+            self.error = None
+            self.started_at = time.time()
+            self.ready_at = None
+        Thread(target=self._run, name="qa-initializer", daemon=True).start()
+        return True
+
+    def _run(self):
+        logger.info("Initializing QA system in background...")
+        try:
+            system = self.factory(progress=self.report)
+        except Exception as e:
+            logger.error(f"QA system initialization failed: {e}")
+            with self._condition:
+                self.state = FAILED
+                self.error = str(e)
+                self._condition.notify_all()
+            return
+
+        with self._condition:
+            self._system = system
+            self._set_stage(READY)
+            self.ready_at = time.time()
+            self._condition.notify_all()
+        logger.info(f"QA system initialized in {self.ready_at - self.started_at:.2f} seconds.")
+
+    def _set_stage(self, stage, done=None, total=None):
+        low, high = STAGE_PROGRESS[stage]
+        fraction = done / total if total else 0.0
+        self.state = stage
+        self.progress = round(low + (high - low) * min(fraction, 1.0), 1)
+        self.detail = f"{done}/{total}" if total else ""
+
+    def report(self, stage, done=None, total=None):
+        """Progress callback passed to the factory."""
+        with self._condition:
+            if self.state in (READY, FAILED):
+                return
+            self._set_stage(stage, done, total)
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def get(self, timeout=None):
+        """
+        Return the QA system, starting the build if it has not been started.
+
+        Waits up to timeout seconds (forever if None) for warm-up to finish and
+        returns None if the system is still not ready, or the build failed.
+        """
+        if self.state == IDLE:
+            self.start()
+        with self._condition:
+            self._condition.wait_for(lambda: self.state in (READY, FAILED), timeout=timeout)
+            return self._system if self.state == READY else None
+
+    def status(self):
+        """Current state, progress percentage and timings for /status."""
+        with self._condition:
+            status = {
+                "status": self.state,
+                "progress": self.progress,
+                "detail": self.detail,
+            }
+            if self.error:
+                status["error"] = self.error
+            if self.started_at:
+                status["elapsed"] = round((self.ready_at or time.time()) - self.started_at, 2)
+            return status
@@ -1,80 +1,257 @@
+import os
+import time
+import queue
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 from config import get_config
-from src.file_utils import get_documents_to_index, save_file_hashes, load_conversation_history, save_conversation_history
+from src.file_utils import get_documents_to_index, save_file_hashes
+from src.conversation_history import ConversationHistory
+from src.conversation_summary import RollingSummary
+from src.session_store import ConversationSession, SessionStore, DEFAULT_SESSION_ID
 from src.embedding import create_embedding_model
+from src.onnx_embedding import DEFAULT_ONNX_FILE
 from src.llm import LLMInterface
+from src.llm_cache import LLMResponseCache
 from src.index_manager import IndexManager
 from src.document_processor import DocumentProcessor
+from src.answer_cache import SemanticAnswerCache
+from src.context_packer import ContextPacker
+from src.text_cleaner import TextCleaner
+from src import telemetry
 
 class SmartDocumentQA:
     """Smart document question answering system."""
     
-    def __init__(self, config=None):
-        """Initialize the QA system with given or default configuration."""
+    def __init__(self, config=None, progress=None):
+        """
+        Initialize the QA system with given or default configuration.
+
+        progress, if given, is called as progress(stage, done=None, total=None)
+        as warm-up moves through loading_model, scanning_files and indexing.
+        """
+        progress = progress or (lambda stage, done=None, total=None: None)
+
         # Load configuration
         self.config = config or get_config()
+        telemetry.configure(self.config.get("metrics_enabled", False))
         self.data_dir = self.config["data_dir"]
         self.persist_dir = self.config["persist_dir"]
         self.file_hashes_path = self.config["file_hashes_path"]
 
         self.general_history_path = self.config["general_history_path"]
         self.source_history_path = self.config["source_history_path"]
-        self.general_conversation_history = load_conversation_history(self.general_history_path)
-        self.source_conversation_history = load_conversation_history(self.source_history_path)
+        history_max_entries = self.config.get("history_max_entries")
+        self.general_conversation_history = ConversationHistory(self.general_history_path, history_max_entries)
+        self.source_conversation_history = ConversationHistory(self.source_history_path, history_max_entries)
+        source_summary = RollingSummary(
+            self.config.get("source_summary_path")
+            or f"{os.path.splitext(self.source_history_path)[0]}_summary.json"
+        )
         
         # Initialize components
-        self.embed_model = create_embedding_model(self.config["embedding_model"])
+        progress("loading_model")
+        self.embed_model = create_embedding_model(
+            self.config["embedding_model"],
+            cache_size=self.config.get("query_cache_size", 1024),
+            cache_ttl=self.config.get("query_cache_ttl"),
+            cache_path=self.config.get("query_cache_path"),
+            embed_batch_size=self.config.get("embed_batch_size", 10),
+            query_batch_size=self.config.get("query_batch_size", 0),
+            query_batch_wait=self.config.get("query_batch_wait_ms", 5) / 1000,
+            backend=self.config.get("embedding_backend", "torch"),
+            onnx_file=self.config.get("embedding_onnx_file") or DEFAULT_ONNX_FILE,
+            quantize=self.config.get("embedding_quantize", False),
+            threads=self.config.get("embedding_threads")
+        )
+        # Byte-identical prompts are answered from a disk-backed response cache
+        llm_cache_path = self.config.get("llm_cache_path")
+        response_cache = LLMResponseCache(
+            llm_cache_path,
+            ttl=self.config.get("llm_cache_ttl"),
+            max_entries=self.config.get("llm_cache_max_entries", 10000)
+        ) if llm_cache_path else None
+        default_session = ConversationSession(
+            DEFAULT_SESSION_ID, self.general_conversation_history, self.source_conversation_history, source_summary,
+            lock_path=f"{os.path.splitext(self.source_history_path)[0]}.lock"
+        )
         self.llm = LLMInterface(
             model_name=self.config["llm_model"],
-            temperature=self.config["llm_temperature"]
+            temperature=self.config["llm_temperature"],
+            response_cache=response_cache,
+            default_session=default_session
+        )
+        # Per-client conversations; questions without a session ID use the histories above
+        self.sessions = SessionStore(
+            session_dir=self.config.get("session_dir"),
+            max_sessions=self.config.get("session_max", 1000),
+            ttl=self.config.get("session_ttl"),
+            history_max_entries=history_max_entries,
+            default_session=default_session
         )
         
         # Set up document indexing
+        self.text_cleaner = TextCleaner(self.config.get("cleaner_phrases"))
+        progress("scanning_files")
         documents_to_index, new_hashes = get_documents_to_index(
             self.data_dir, 
-            self.file_hashes_path
+            self.file_hashes_path,
+            max_workers=self.config.get("hash_workers", 8)
         )
         
-        index_manager = IndexManager(self.persist_dir, self.embed_model)
-        self.index = index_manager.get_or_create_index(documents_to_index)
+        self.index_manager = index_manager = IndexManager(
+            self.persist_dir,
+            self.embed_model,
+            embed_batch_size=self.config.get("embed_batch_size"),
+            embed_workers=self.config.get("embed_workers", 1),
+            parse_workers=self.config.get("parse_workers"),
+            vector_store=self.config.get("vector_store", "mmap"),
+            vector_dtype=self.config.get("vector_dtype", "float32"),
+            ann_index=self.config.get("ann_index", "none"),
+            ann_options={
+                key: self.config[key]
+                for key in ("ivf_nlist", "ivf_nprobe", "ivf_min_rows")
+                if self.config.get(key) is not None
+            },
+            progress=lambda done, total: progress("indexing", done, total),
+            cleaner=self.text_cleaner,
+            rescore_factor=self.config.get("vector_rescore_factor", 0)
+        )
+        progress("indexing", 0, len(documents_to_index))
+        self.index = index_manager.get_or_create_index(
+            documents_to_index,
+            current_documents=new_hashes.keys(),
+            file_hashes={path: entry[0] for path, entry in new_hashes.items()}
+        )
         
-        # Save index and hashes if needed
-        if documents_to_index:
+        # Save index if needed; the manifest is always refreshed so that files
+        # whose size and mtime are unchanged skip hashing on the next startup
+        if index_manager.modified:
             index_manager.save_index(self.index)
-            save_file_hashes(self.file_hashes_path, new_hashes)
+        # Files that failed to parse stay out of the manifest so they are retried
+        for path in index_manager.failed_files:
+            new_hashes.pop(path, None)
+        save_file_hashes(self.file_hashes_path, new_hashes)
         
         # Initialize document processor
-        self.document_processor = DocumentProcessor(self.index, self.embed_model)
-    
+        self.document_processor = DocumentProcessor(
+            self.index, self.embed_model, cleaner=self.text_cleaner, catalog=index_manager.catalog
+        )
+        self.context_packer = ContextPacker(
+            token_budget=self.config.get("context_token_budget", 3000),
+            overlap_threshold=self.config.get("context_overlap_threshold", 0.8)
+        )
 
-    def ask_question(self, question):
-        """Process a question with conversation context and return relevant answers and sources."""
-        print(f"\n🤖 Asking: {question}")
-        
-        # 1. Build conversation-aware query for better retrieval
-        recent_history = self.source_conversation_history[-3:] if len(self.source_conversation_history) >= 3 else self.source_conversation_history
+        # Answers to paraphrased questions are served from a semantic cache,
+        # keyed on the index version so re-indexing invalidates them
+        answer_cache_size = self.config.get("answer_cache_size", 256)
+        self.answer_cache = SemanticAnswerCache(
+            max_size=answer_cache_size,
+            threshold=self.config.get("answer_cache_threshold", 0.9),
+            ttl=self.config.get("answer_cache_ttl"),
+            path=self.config.get("answer_cache_path")
+        ) if answer_cache_size else None
+
+    @staticmethod
+    def _timed_call(func, *args):
+        """Call func and return its result together with the elapsed seconds."""
+        start = time.time()
+        result = func(*args)
+        return result, time.time() - start
+
+    def save_caches(self):
+        """Persist the query embedding cache; server workers call this as they exit since atexit does not run there."""
+        cache = getattr(self.embed_model, "cache", None)
+        if cache is not None:
+            cache.save()
+
+    def _lookup_answer(self, question, session):
+        """
+        Look the question up in the semantic answer cache, recording a hit in the session's history.
+
+        Only questions that open a conversation are cached: their answers depend on
+        the question and the index alone, so they can be shared between sessions,
+        while a follow-up's answer also depends on the session's earlier turns.
+        They are matched by the embedding of their retrieval query, which a miss
+        passes on to the search instead of embedding the question twice.
+
+        Returns:
+            tuple: (cached result or None, retrieval query embedding or None when the answer is not cacheable)
+        """
+        if self.answer_cache is None or session.general_history or session.source_history:
+            return None, None
+
+        start = time.time()
+        with telemetry.span("answer_cache.lookup"):
+            embedding = self.embed_model.get_query_embedding(self._build_contextual_query(question, session))
+            result, similarity = self.answer_cache.get(question, embedding, self.index_manager.index_version)
+        telemetry.increment("qa_answer_cache_total", result="miss" if result is None else "hit")
+        if result is None:
+            return None, embedding
+
+        print(f"♻️ Answer served from cache (similarity {similarity:.3f} to: {result['question']})")
+        result["answer_cache"] = self._answer_cache_info(hit=True, similarity=similarity, cached_question=result["question"])
+        result.update({
+            "question": question,
+            "search_duration": time.time() - start,
+            "summary_duration": 0.0,
+            "general_answer_duration": 0.0,
+            "llm_duration": 0.0,
+            "llm_cache": self.llm.latency_stats(),
+        })
+        self._save_history(session, question, result["source_based_summary"], result["general_answer"])
+        return result, embedding
+
+    def _store_answer(self, question, embedding, result):
+        """Cache a freshly computed result, unless its embedding is None, and attach the cache statistics to it."""
+        if embedding is not None:
+            self.answer_cache.put(question, embedding, result, self.index_manager.index_version)
+        result["answer_cache"] = self._answer_cache_info(hit=False)
+        return result
+
+    def _answer_cache_info(self, hit, **details):
+        """Answer cache outcome of a single question plus the running hit rate."""
+        stats = self.answer_cache.stats() if self.answer_cache is not None else {"hit_rate": 0.0}
+        return {"hit": hit, "hit_rate": stats["hit_rate"], **details}
+
+    def _build_contextual_query(self, question, session):
+        """Build a conversation-aware query for better retrieval."""
+        recent_history = session.source_history.tail(3)
         contextual_query = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in recent_history])
         contextual_query += f"\nQ: {question}\nA:"
+        return contextual_query
 
-        # 2. Search documents using the full context
-        search_results = self.document_processor.search_documents(contextual_query)
+    def _search(self, question, session, query_embedding=None):
+        """
+        Retrieve passages for the question and pack them into the LLM context budget.
 
-        # 3. Generate source-based summary using the same context
-        source_based_summary = self.llm.get_source_based_summary(
-            question, 
-            search_results["source_texts"]
-        )
-        
-        # 4. Save to source conversation history
-        self.source_conversation_history.append({"question": question, "answer": source_based_summary})
-        save_conversation_history(self.source_history_path, self.source_conversation_history)
-        
-        # 5. Generate general answer (optional: use same context here too)
-        general_answer = self.llm.get_general_answer(question)
-        self.general_conversation_history.append({"question": question, "answer": general_answer})
-        save_conversation_history(self.general_history_path, self.general_conversation_history)
+        query_embedding is the embedding of the conversation-aware query if the
+        answer cache lookup already computed it.
+        """
+        contextual_query = self._build_contextual_query(question, session)
+        with telemetry.span("search"):
+            search_results = self.document_processor.search_documents(
+                contextual_query, query_embedding=query_embedding
+            )
+        with telemetry.span("context_packing"):
+            search_results["context_texts"], search_results["context_stats"] = self.context_packer.pack(
+                search_results["source_info"]
+            )
+
+        context_stats = search_results["context_stats"]
+        telemetry.increment("qa_context_tokens_total", context_stats["tokens"])
+        telemetry.increment("qa_context_passages_dropped_total", context_stats["duplicates_dropped"], reason="duplicate")
+        telemetry.increment("qa_context_passages_dropped_total", context_stats["budget_dropped"], reason="budget")
+        return search_results
 
-        # 6. Compile result
-        result = {
+    def _save_history(self, session, question, source_based_summary, general_answer):
+        """Append the turn to the session's source history, then its general history."""
+        with telemetry.span("history.save"):
+            session.source_history.append(question, source_based_summary)
+            session.general_history.append(question, general_answer)
+
+    def _compile_result(self, question, search_results, source_based_summary, general_answer, timings):
+        """Compile the result dict returned to the console and web front ends."""
+        return {
             "question": question,
             "general_answer": general_answer,
             "source_based_summary": source_based_summary,
@@ -83,7 +260,151 @@ class SmartDocumentQA:
             "documents_with_no_matches": list(search_results["documents_with_no_matches"]),
             "avg_score": search_results["avg_score"],
             "search_duration": search_results["search_duration"],
+            "summary_duration": timings["summary_duration"],
+            "general_answer_duration": timings["general_answer_duration"],
+            "llm_duration": timings["llm_duration"],
             "total_documents": search_results["total_documents"],
+            "context": search_results["context_stats"],
+            "llm_cache": self.llm.latency_stats(),
         }
 
-        return result
+    def ask_question(self, question, session_id=None):
+        """
+        Process a question with conversation context and return relevant answers and sources.
+
+        The conversation is that of session_id, or the default session when none is given.
+        Questions of one session are answered one at a time; different sessions run concurrently.
+        """
+        telemetry.increment("qa_requests_total", mode="blocking")
+        session = self.sessions.get(session_id)
+        with telemetry.span("ask_question"), session.lock:
+            session.refresh()
+            return self._answer_question(question, session)
+
+    def _answer_question(self, question, session):
+        """Answer a question; the body of ask_question."""
+        print(f"\n🤖 Asking: {question}")
+
+        # 0. Serve paraphrases of recently answered questions from the answer cache
+        cached_result, query_embedding = self._lookup_answer(question, session)
+        if cached_result is not None:
+            return cached_result
+
+        # 1-2. Search documents with a conversation-aware query, then dedupe, rank and
+        #      pack the passages into the context token budget
+        search_results = self._search(question, session, query_embedding)
+
+        # 3. Generate the source-based summary and the general answer concurrently;
+        #    they are independent LLM round-trips
+        llm_start = time.time()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            summary_future = executor.submit(
+                self._timed_call,
+                self.llm.get_source_based_summary,
+                question,
+                search_results["context_texts"],
+                session
+            )
+            general_future = executor.submit(self._timed_call, self.llm.get_general_answer, question, session)
+            source_based_summary, summary_duration = summary_future.result()
+            general_answer, general_answer_duration = general_future.result()
+        llm_duration = time.time() - llm_start
+
+        # 4. Save to the session's source and general conversation history
+        self._save_history(session, question, source_based_summary, general_answer)
+
+        # 5. Compile and cache the result
+        result = self._compile_result(question, search_results, source_based_summary, general_answer, {
+            "summary_duration": summary_duration,
+            "general_answer_duration": general_answer_duration,
+            "llm_duration": llm_duration,
+        })
+        return self._store_answer(question, query_embedding, result)
+
+    def ask_question_stream(self, question, session_id=None):
+        """
+        Process a question like ask_question, yielding (event, data) pairs as results arrive.
+
+        Events are emitted in order: "sources" once retrieval finishes, "summary" for
+        each source-based summary token, "general" for each general answer token, and
+        finally "result" with the same dict ask_question returns. The general answer is
+        generated concurrently and buffered until the summary has finished streaming.
+        The session is locked while the answer streams, as in ask_question.
+        """
+        telemetry.increment("qa_requests_total", mode="stream")
+        session = self.sessions.get(session_id)
+        with telemetry.span("ask_question_stream"), session.lock:
+            session.refresh()
+            yield from self._stream_answer(question, session)
+
+    def _stream_answer(self, question, session):
+        """Stream the answer to a question; the body of ask_question_stream."""
+        print(f"\n🤖 Asking (streaming): {question}")
+
+        cached_result, query_embedding = self._lookup_answer(question, session)
+        if cached_result is not None:
+            yield "sources", {
+                "sources": cached_result["source_info"],
+                "total_documents": cached_result["total_documents"],
+                "documents_with_matches": len(cached_result["documents_with_matches"]),
+                "search_duration": cached_result["search_duration"],
+            }
+            yield "summary", cached_result["source_based_summary"]
+            yield "general", cached_result["general_answer"]
+            yield "result", cached_result
+            return
+
+        search_results = self._search(question, session, query_embedding)
+        yield "sources", {
+            "sources": search_results["source_info"],
+            "total_documents": search_results["total_documents"],
+            "documents_with_matches": len(search_results["documents_with_matches"]),
+            "search_duration": search_results["search_duration"],
+        }
+
+        llm_start = time.time()
+        general_tokens = queue.Queue()
+        general_timing = {}
+
+        def produce_general_answer():
+            start = time.time()
+            try:
+                for token in self.llm.stream_general_answer(question, session):
+                    general_tokens.put(token)
+            except Exception as e:
+                general_tokens.put(e)
+            finally:
+                general_timing["duration"] = time.time() - start
+                general_tokens.put(None)
+
+        worker = Thread(target=produce_general_answer, daemon=True)
+        worker.start()
+
+        summary_tokens = []
+        for token in self.llm.stream_source_based_summary(question, search_results["context_texts"], session):
+            summary_tokens.append(token)
+            yield "summary", token
+        summary_duration = time.time() - llm_start
+
+        answer_tokens = []
+        while True:
+            token = general_tokens.get()
+            if token is None:
+                break
+            if isinstance(token, Exception):
+                raise token
+            answer_tokens.append(token)
+            yield "general", token
+        worker.join()
+        llm_duration = time.time() - llm_start
+
+        source_based_summary = "".join(summary_tokens).strip()
+        general_answer = "".join(answer_tokens).strip()
+        self._save_history(session, question, source_based_summary, general_answer)
+
+        result = self._compile_result(question, search_results, source_based_summary, general_answer, {
+            "summary_duration": summary_duration,
+            "general_answer_duration": general_timing["duration"],
+            "llm_duration": llm_duration,
+        })
+        yield "result", self._store_answer(question, query_embedding, result)
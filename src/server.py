@@ -0,0 +1,138 @@
+import os
+import time
+import signal
+import socket
+import logging
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this many seconds after starting counts as a crash
+MIN_WORKER_UPTIME = 10.0
+# Seconds before replacing a crashed worker, doubled for each further consecutive crash
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+# Consecutive crashes after which the server stops instead of respawning
+MAX_CRASHES = 5
+
+def _stop_worker(signum, frame):
+    # Ctrl+C reaches workers as SIGINT and then SIGTERM from the parent; only the first stops it
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Unwinds serve_forever so the worker's exit hook runs
+    raise SystemExit(0)
+
+def _serve_worker(app, host, port, listen_socket, on_exit=None):
+    """Serve requests on the shared listening socket until terminated, then run on_exit."""
+    signal.signal(signal.SIGTERM, _stop_worker)
+    signal.signal(signal.SIGINT, _stop_worker)
+    server = make_server(host, port, app, threaded=True, fd=listen_socket.fileno())
+    logger.info(f"Worker {os.getpid()} serving on {host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        if on_exit is not None:
+            on_exit()
+
+def _spawn_worker(app, host, port, listen_socket, on_exit=None):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _serve_worker(app, host, port, listen_socket, on_exit)
+        except Exception:
+            logger.exception(f"Worker {os.getpid()} failed")
+            code = 1
+        finally:
+            # atexit handlers belong to the parent and must not run here
+            os._exit(code)
+    return pid
+
+def serve(app, host="0.0.0.0", port=5000, workers=None, preload=None, on_worker_exit=None):
+    """
+    Serve a WSGI app from a pool of pre-forked worker processes.
+
+    preload runs once in the parent before any worker is forked, so large
+    read-only state it builds (the embedding model, the index and its
+    memory-mapped vectors) is shared copy-on-write instead of being loaded
+    once per worker. Anything mutated after the fork is private to each
+    worker unless it lives in a shared store (files, SQLite). Workers accept
+    connections from one shared listening socket and handle each request on
+    a thread; a worker that exits is replaced. Workers that keep crashing
+    right after starting are replaced with an exponential backoff, and after
+    MAX_CRASHES such crashes in a row the server stops. Where fork is unavailable, or
+    with a single worker, the app is served from this process.
+
+    Each worker runs Werkzeug's threaded WSGI server, which has no request
+    timeouts or protection against slow clients; expose it through a reverse
+    proxy such as nginx rather than directly.
+
+    Args:
+        app: WSGI application
+        host (str): Interface to bind
+        port (int): Port to bind
+        workers (int): Worker processes; defaults to the CPU count
+        preload (callable): Called before forking to build shared state
+        on_worker_exit (callable): Called in each worker as it stops, to persist state
+            its atexit handlers would otherwise have saved
+    """
+    workers = workers or os.cpu_count() or 1
+    if preload is not None:
+        preload()
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        logger.info(f"Serving on {host}:{port} with a single process")
+        make_server(host, port, app, threaded=True).serve_forever()
+        return
+
+    listen_socket = socket.create_server((host, port), backlog=1024)
+    # pid -> time.monotonic() the worker was started at
+    children = {}
+    stopping = False
+    crashes = 0
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        children[_spawn_worker(app, host, port, listen_socket, on_worker_exit)] = time.monotonic()
+    logger.info(f"Serving on {host}:{port} with {workers} worker processes")
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = children.pop(pid, None)
+            if stopping:
+                continue
+            if started is not None and time.monotonic() - started < MIN_WORKER_UPTIME:
+                crashes += 1
+            else:
+                crashes = 0
+            if crashes >= MAX_CRASHES:
+                logger.error(f"Workers crashed {crashes} times in a row after starting; stopping the server")
+                stop(None, None)
+                continue
+            delay = min(RESTART_DELAY * 2 ** (crashes - 1), MAX_RESTART_DELAY) if crashes else 0.0
+            logger.warning(f"Worker {pid} exited with status {status}, starting a replacement in {delay:.1f}s")
+            time.sleep(delay)
+            if not stopping:
+                children[_spawn_worker(app, host, port, listen_socket, on_worker_exit)] = time.monotonic()
+    finally:
+        listen_socket.close()
+        logger.info("Server stopped")
+    if crashes >= MAX_CRASHES:
+        raise SystemExit(1)
@@ -0,0 +1,204 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+
+from src.conversation_history import ConversationHistory
+from src.conversation_summary import RollingSummary
+from src.file_utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Session used when a caller does not send a session ID (the console and older clients)
+DEFAULT_SESSION_ID = "default"
+
+# Seconds between sweeps of session_dir for expired sessions (at most the TTL)
+SWEEP_INTERVAL = 3600
+
+class SessionLock:
+    """
+    Lock held while a question of one session is answered, so its turns are recorded in order.
+
+    With a lock_path it also takes an exclusive flock on that file, which
+    serializes the session across the server's worker processes as well as
+    across the threads of this one.
+    """
+
+    def __init__(self, lock_path=None):
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._held = contextlib.ExitStack()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self.lock_path:
+                self._held.enter_context(file_lock(self.lock_path))
+        except BaseException:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._held.close()
+        self._lock.release()
+
+
+class ConversationSession:
+    """The conversation state of one client: general and source histories plus the rolling summary."""
+
+    def __init__(self, session_id, general_history, source_history, source_summary, lock_path=None):
+        self.session_id = session_id
+        self.general_history = general_history
+        self.source_history = source_history
+        self.source_summary = source_summary
+        # Held while a question of this session is answered; lock_path extends it across processes
+        self.lock = SessionLock(lock_path)
+        self.last_used = time.time()
+
+    def refresh(self):
+        """Pick up turns and summary updates other worker processes recorded; call with the lock held."""
+        self.general_history.refresh()
+        self.source_history.refresh()
+        self.source_summary.refresh()
+
+
+class SessionStore:
+    """
+    Bounded map of conversation sessions keyed by a client-supplied session ID.
+
+    Sessions live in memory with LRU eviction beyond max_sessions and are
+    dropped after ttl seconds without use. With a session_dir every session's
+    histories are written through to files under it, so an evicted session is
+    reloaded from disk on its next question; without one, sessions are memory
+    only. Sessions are locked individually and the store lock is only held
+    to look sessions up, so different sessions are answered concurrently.
+    Sessions in session_dir are shared by every worker process: their lock
+    is a file lock and their files are re-read when another worker changed
+    them, so turns can be routed to any worker.
+    session_dir is swept for sessions unused for ttl seconds, including ones
+    that were evicted from memory and never asked about again.
+    """
+
+    def __init__(self, session_dir=None, max_sessions=1000, ttl=None, history_max_entries=None, default_session=None):
+        """
+        Initialize the store.
+
+        Args:
+            session_dir (str): Directory sessions spill to; None keeps them in memory only
+            max_sessions (int): Sessions kept in memory before the least recently used is evicted
+            ttl (float): Seconds a session is kept after its last use, or None to keep it until evicted
+            history_max_entries (int): Turns kept per history when a session's files are compacted
+            default_session (ConversationSession): Session served when no ID is given;
+                it is never evicted
+        """
+        self.session_dir = session_dir
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_max_entries = history_max_entries
+        self.default_session = default_session or self._new_session(DEFAULT_SESSION_ID, memory_only=True)
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _session_path(self, session_id):
+        # Hashed, so client-supplied IDs cannot escape session_dir
+        return os.path.join(self.session_dir, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+    def _remove_if_expired(self, directory, now):
+        """Delete a session directory that has not been used for ttl seconds."""
+        try:
+            expired = self.ttl is not None and now - os.path.getmtime(directory) > self.ttl
+        except OSError:
+            return
+        if expired:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def sweep(self, now=None):
+        """Delete every session directory under session_dir that has not been used for ttl seconds."""
+        if not self.session_dir or self.ttl is None or not os.path.isdir(self.session_dir):
+            return
+        now = now or time.time()
+        for entry in os.scandir(self.session_dir):
+            if entry.is_dir():
+                self._remove_if_expired(entry.path, now)
+
+    def _new_session(self, session_id, memory_only=False):
+        """Open a session, loading its histories from session_dir when it spilled there earlier."""
+        if memory_only or not self.session_dir:
+            paths = (None, None, None, None)
+        else:
+            directory = self._session_path(session_id)
+            self._remove_if_expired(directory, time.time())
+            paths = tuple(os.path.join(directory, name) for name in (
+                "general_history.jsonl", "source_history.jsonl", "source_summary.json", "session.lock"
+            ))
+        return ConversationSession(
+            session_id,
+            ConversationHistory(paths[0], self.history_max_entries),
+            ConversationHistory(paths[1], self.history_max_entries),
+            RollingSummary(paths[2]),
+            lock_path=paths[3]
+        )
+
+    def _expired(self, session, now):
+        return self.ttl is not None and now - session.last_used > self.ttl
+
+    def _evict(self, now):
+        """Drop expired sessions, then the least recently used beyond max_sessions; in-use sessions are kept."""
+        for session_id, session in list(self._sessions.items()):
+            over_capacity = len(self._sessions) > self.max_sessions
+            if not over_capacity and not self._expired(session, now):
+                break
+            if session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self.evictions += 1
+            # Evicted but unexpired sessions keep their files until the sweep finds them unused
+            if self._expired(session, now) and self.session_dir:
+                self._remove_if_expired(self._session_path(session_id), now)
+
+    def get(self, session_id=None):
+        """Return the session for session_id, creating or reloading it as needed."""
+        if not session_id or session_id == DEFAULT_SESSION_ID:
+            return self.default_session
+
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session, now) and not session.lock.locked():
+                del self._sessions[session_id]
+                session = None
+            if session is None:
+                session = self._new_session(session_id)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            self._evict(now)
+            sweep_due = self.ttl is not None and now - self._last_sweep > min(self.ttl, SWEEP_INTERVAL)
+            if sweep_due:
+                self._last_sweep = now
+        if session.source_history.path:
+            # Marks the session's files as used for TTL checks after a restart and by the sweep
+            os.makedirs(os.path.dirname(session.source_history.path), exist_ok=True)
+            os.utime(os.path.dirname(session.source_history.path))
+        if sweep_due:
+            self.sweep(now)
+        return session
+
+    def stats(self):
+        """Sessions in memory, the capacity, and evictions so far."""
+        with self._lock:
+            return {"active": len(self._sessions), "max_sessions": self.max_sessions, "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import shutil
+import logging
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the span latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SPAN_METRIC = "qa_span_duration_seconds"
+
+# name -> help text of every counter that may be reported
+COUNTERS = {
+    "qa_requests_total": "Questions answered, by mode.",
+    "qa_answer_cache_total": "Semantic answer cache lookups, by result.",
+    "qa_llm_requests_total": "LLM prompts, by whether they were served from the response cache.",
+    "qa_llm_tokens_total": "LLM tokens reported by the provider, by direction.",
+    "qa_context_tokens_total": "Passage tokens packed into source prompts.",
+    "qa_context_passages_dropped_total": "Retrieved passages left out of source prompts, by reason.",
+    "qa_index_files_total": "Files ingested into the index.",
+    "qa_index_nodes_total": "Nodes embedded and inserted into the index.",
+}
+
+# Seconds between snapshots a worker process writes for the others to merge
+SHARED_FLUSH_INTERVAL = 1.0
+
+_enabled = False
+# Directory of per-process metric snapshots when metrics are merged across processes
+_shared_dir = None
+_snapshot_name = None
+
+
+class _Registry:
+    """Thread-safe counters and span latency histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        # span name -> [bucket counts..., +Inf count], sum
+        self.histograms = {}
+
+    def increment(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, span_name, seconds):
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            histogram = self.histograms.get(span_name)
+            if histogram is None:
+                histogram = self.histograms[span_name] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Copies of the counters and histograms."""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: (list(buckets), total) for name, (buckets, total) in self.histograms.items()}
+        return counters, histograms
+
+
+_registry = _Registry()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def configure(enabled):
+    """Turn span and counter collection on or off for this process."""
+    global _enabled
+    _enabled = bool(enabled)
+    logger.debug(f"Telemetry {'enabled' if _enabled else 'disabled'}")
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name):
+    """
+    Context manager timing a block into the latency histogram of span name.
+
+    When telemetry is disabled a shared no-op context manager is returned.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter from COUNTERS."""
+    if _enabled and value:
+        _registry.increment(name, value, tuple(sorted(labels.items())))
+
+
+def reset():
+    """Drop all collected metrics."""
+    _registry.clear()
+
+
+def share_between_processes(directory):
+    """
+    Merge the metrics of this process and the worker processes it forks from now on.
+
+    Call in the server's parent process before forking. Every process writes
+    a snapshot of its metrics to directory (workers about every
+    SHARED_FLUSH_INTERVAL seconds and on flush()), and render() adds up the
+    snapshots, so a scrape reaching any worker reports the totals. Snapshots
+    of exited workers are kept, so counters never go backwards when one is
+    replaced. The directory is emptied now and removed when this process exits.
+    """
+    global _shared_dir, _snapshot_name
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    _shared_dir = directory
+    _snapshot_name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+    # What the parent collected before forking (indexing) is counted once, here
+    flush()
+    atexit.register(shutil.rmtree, directory, True)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_start_worker_snapshots)
+
+
+def _start_worker_snapshots():
+    """Start a forked worker's metrics from zero and write snapshots of them periodically."""
+    global _registry, _snapshot_name
+    if _shared_dir is None:
+        return
+    _registry = _Registry()
+    # Unique even when a replacement worker reuses a PID
+    _snapshot_name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+    def write_snapshots():
+        while True:
+            time.sleep(SHARED_FLUSH_INTERVAL)
+            flush()
+
+    threading.Thread(target=write_snapshots, name="telemetry-snapshots", daemon=True).start()
+
+
+def flush():
+    """Write this process's metrics snapshot when they are merged across processes."""
+    if _shared_dir is None:
+        return
+    counters, histograms = _registry.snapshot()
+    path = os.path.join(_shared_dir, _snapshot_name)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+                "histograms": histograms,
+            }, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot {path}: {e}")
+
+
+def _merged_snapshot():
+    """This process's metrics plus the latest snapshots of every other process sharing them."""
+    counters, histograms = _registry.snapshot()
+    if _shared_dir is None:
+        return counters, histograms
+    try:
+        names = [name for name in os.listdir(_shared_dir) if name.endswith(".json") and name != _snapshot_name]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(_shared_dir, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for counter, labels, value in data["counters"]:
+            key = (counter, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for span_name, (buckets, total) in data["histograms"].items():
+            merged = histograms.setdefault(span_name, ([0] * len(buckets), 0.0))
+            histograms[span_name] = ([a + b for a, b in zip(merged[0], buckets)], merged[1] + total)
+    return counters, histograms
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def render():
+    """Return the collected metrics, of all processes sharing them, in the Prometheus text exposition format."""
+    counters, histograms = _merged_snapshot()
+
+    lines = []
+    for name, help_text in COUNTERS.items():
+        samples = sorted((labels, value) for (counter, labels), value in counters.items() if counter == name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in samples)
+
+    if histograms:
+        lines.append(f"# HELP {SPAN_METRIC} Latency of instrumented spans.")
+        lines.append(f"# TYPE {SPAN_METRIC} histogram")
+        for span_name in sorted(histograms):
+            buckets, total = histograms[span_name]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += count
+                lines.append(f'{SPAN_METRIC}_bucket{{span="{span_name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{SPAN_METRIC}_sum{{span="{span_name}"}} {total}')
+            lines.append(f'{SPAN_METRIC}_count{{span="{span_name}"}} {cumulative}')
+
+    return "\n".join(lines) + "\n"
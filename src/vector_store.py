@@ -0,0 +1,490 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from src.ann_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILENAME = "vectors.npy"
+VECTOR_SCALES_FILENAME = "vector_scales.npy"
+FULL_VECTORS_FILENAME = "vectors_full.npy"
+VECTOR_IDS_FILENAME = "vector_ids.json"
+IVF_FILENAME = "ivf_index.npz"
+LEGACY_VECTOR_STORE_FILENAME = "default__vector_store.json"
+
+# Rows upcast to float32 per block when the matrix is float16 or int8; small enough
+# that the reused block buffer stays in cache
+SCORE_BLOCK_ROWS = 2048
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store keeping normalized embeddings in one contiguous NumPy matrix.
+
+    The matrix is persisted as a .npy file that is memory-mapped on load, with
+    node and ref-doc IDs in a JSON sidecar, so startup does not parse float
+    lists and scoring is a single vectorized dot product (cosine similarity).
+
+    With ann="ivf" an inverted-file index (see IVFIndex) restricts scoring to
+    the rows of the ivf_nprobe clusters closest to the query once the store
+    holds at least ivf_min_rows vectors; smaller stores are scanned exactly.
+
+    Vectors can be held as float16, or as int8 with one float32 scale per row
+    (a quarter of the float32 size). With rescore_factor > 0 a quantized store
+    also persists the float32 vectors in a separate memory-mapped file and
+    re-ranks the top similarity_top_k * rescore_factor candidates with them,
+    so only the rows being rescored are ever paged in.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float32"
+    ann: str = "none"
+    ivf_nlist: Optional[int] = None
+    ivf_nprobe: int = 8
+    ivf_min_rows: int = 10000
+    rescore_factor: int = 0
+
+    _matrix: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _full: Optional[np.ndarray] = PrivateAttr(default=None)
+    _pending: List[np.ndarray] = PrivateAttr(default_factory=list)
+    _node_ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _row_of: dict = PrivateAttr(default_factory=dict)
+    _rows_of_ref_doc: dict = PrivateAttr(default_factory=dict)
+    _alive: List[bool] = PrivateAttr(default_factory=list)
+    _alive_mask: Optional[np.ndarray] = PrivateAttr(default=None)
+    _dirty: bool = PrivateAttr(default=False)
+    _mmap: bool = PrivateAttr(default=True)
+    _ivf: Optional[IVFIndex] = PrivateAttr(default=None)
+    # Serializes folding in pending rows and IVF training between concurrent queries
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+
+    def __init__(self, dtype: str = "float32", ann: str = "none", **kwargs: Any):
+        """Initialize an empty store holding vectors as dtype (float32, float16 or int8)."""
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        if ann not in ("none", "ivf"):
+            raise ValueError(f"Unsupported ANN index: {ann}")
+        super().__init__(dtype=dtype, ann=ann, **kwargs)
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def keeps_full_precision(self):
+        """Whether float32 copies of quantized vectors are kept for rescoring."""
+        return self.rescore_factor > 0 and self.dtype != "float32"
+
+    @property
+    def dirty(self):
+        """Whether the store has changes, including a format conversion on load, that are not persisted yet."""
+        return self._dirty
+
+    @property
+    def node_count(self):
+        """Number of live vectors."""
+        # Not __len__: StorageContext tests stores for truthiness, and an empty store must not be falsy
+        return len(self._row_of)
+
+    def memory_usage(self):
+        """
+        Bytes held by the scored vectors and by the full-precision rescoring copy.
+
+        The rescoring copy is memory-mapped once loaded from disk, so only the
+        rescored rows are paged in.
+        """
+        self._consolidate()
+        vectors = 0
+        if self._matrix is not None:
+            vectors += self._matrix.nbytes
+        if self._scales is not None:
+            vectors += self._scales.nbytes
+        return {"vectors": vectors, "full_precision": self._full.nbytes if self._full is not None else 0}
+
+    def _register(self, node_id, ref_doc_id):
+        """Append IDs for a new row, superseding any previous row of the same node."""
+        previous = self._row_of.get(node_id)
+        if previous is not None:
+            self._alive[previous] = False
+        self._alive_mask = None
+        row = len(self._node_ids)
+        self._node_ids.append(node_id)
+        self._ref_doc_ids.append(ref_doc_id)
+        self._alive.append(True)
+        self._row_of[node_id] = row
+        if ref_doc_id is not None:
+            self._rows_of_ref_doc.setdefault(ref_doc_id, []).append(row)
+
+    def _encode(self, vectors):
+        """Convert normalized float32 vectors to the storage dtype; returns (matrix, scales or None)."""
+        if self.dtype != "int8":
+            return vectors.astype(self.dtype), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        matrix = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return matrix, scales.astype(np.float32)
+
+    @staticmethod
+    def _decode(matrix, scales):
+        """Float32 vectors from a stored matrix and its per-row scales (if any)."""
+        vectors = np.asarray(matrix, dtype=np.float32)
+        return vectors * scales[:, None] if scales is not None else vectors
+
+    def _load_arrays(self, matrix, node_ids, ref_doc_ids, scales=None, full=None):
+        """Replace the store contents with a matrix and its row IDs in one pass."""
+        rows_of_ref_doc = {}
+        for row, ref_doc_id in enumerate(ref_doc_ids):
+            if ref_doc_id is not None:
+                rows_of_ref_doc.setdefault(ref_doc_id, []).append(row)
+
+        self._matrix = matrix
+        self._scales = scales
+        self._full = full
+        self._pending = []
+        self._node_ids = list(node_ids)
+        self._ref_doc_ids = list(ref_doc_ids)
+        self._alive = [True] * len(node_ids)
+        self._alive_mask = None
+        self._row_of = {node_id: row for row, node_id in enumerate(node_ids)}
+        self._rows_of_ref_doc = rows_of_ref_doc
+
+    def _consolidate(self):
+        """Fold vectors added since the last query into the main matrix."""
+        if not self._pending:
+            return
+        with self._lock:
+            # Folded by a concurrent query while this one waited
+            if not self._pending:
+                return
+            added = np.vstack(self._pending)
+            if self._ivf is not None:
+                self._ivf.add(added)
+            encoded, scales = self._encode(added)
+            # Full-precision rows are only kept while they cover every row of the matrix
+            if self.keeps_full_precision and (self._matrix is None or self._full is not None):
+                self._full = np.vstack(([np.asarray(self._full)] if self._full is not None else []) + [added])
+            blocks = ([np.asarray(self._matrix)] if self._matrix is not None else []) + [encoded]
+            self._matrix = np.vstack(blocks).astype(self.dtype, copy=False)
+            if scales is not None:
+                self._scales = np.concatenate(
+                    ([np.asarray(self._scales)] if self._scales is not None else []) + [scales]
+                )
+            self._pending = []
+
+    def _needs_ivf_training(self):
+        if self.ann != "ivf" or self._matrix is None:
+            return False
+        n_rows = self._matrix.shape[0]
+        if n_rows < self.ivf_min_rows:
+            return False
+        return self._ivf is None or n_rows > 2 * self._ivf.trained_rows
+
+    def _ensure_ivf(self):
+        """Train the IVF index when enabled and the store is large enough, or has doubled since training."""
+        if not self._needs_ivf_training():
+            return
+        with self._lock:
+            # Another query may have trained it while this one waited
+            if self._needs_ivf_training():
+                self._ivf = IVFIndex.train(self._matrix, nlist=self.ivf_nlist)
+                self._dirty = True
+
+    def prepare(self):
+        """
+        Fold in pending vectors and train the IVF index if it is due.
+
+        Called once the index is loaded so training happens at startup, and is
+        persisted with the index, rather than inside the first query.
+        """
+        self._consolidate()
+        self._ensure_ivf()
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        """Add nodes' embeddings to the store."""
+        if not nodes:
+            return []
+        vectors = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        # Encoded to the storage dtype when folded into the matrix
+        self._pending.append(self._normalize(vectors))
+        for node in nodes:
+            self._register(node.node_id, node.ref_doc_id)
+        self._dirty = True
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete all rows that belong to ref_doc_id."""
+        for row in self._rows_of_ref_doc.pop(ref_doc_id, []):
+            if self._alive[row]:
+                self._alive[row] = False
+                self._row_of.pop(self._node_ids[row], None)
+        self._alive_mask = None
+        self._dirty = True
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **delete_kwargs: Any) -> None:
+        """Delete rows by node ID."""
+        if filters is not None:
+            raise NotImplementedError("Metadata filters are not supported by MmapVectorStore")
+        for node_id in node_ids or []:
+            row = self._row_of.pop(node_id, None)
+            if row is not None:
+                self._alive[row] = False
+        self._alive_mask = None
+        self._dirty = True
+
+    def clear(self) -> None:
+        """Remove every vector."""
+        self._matrix = None
+        self._scales = None
+        self._full = None
+        self._pending = []
+        self._node_ids, self._ref_doc_ids, self._alive = [], [], []
+        self._alive_mask = None
+        self._row_of, self._rows_of_ref_doc = {}, {}
+        self._ivf = None
+        self._dirty = True
+
+    def live_mask(self):
+        """Boolean mask of rows that have not been deleted or superseded."""
+        if self._alive_mask is None:
+            self._alive_mask = np.asarray(self._alive, dtype=bool)
+        return self._alive_mask
+
+    def _score_rows(self, query, rows=None):
+        """Cosine similarities of a normalized query against all rows, or the given rows."""
+        if rows is not None:
+            scores = np.asarray(self._matrix[rows], dtype=np.float32) @ query
+            return scores * self._scales[rows] if self._scales is not None else scores
+        if self._matrix.dtype == np.float32:
+            return self._matrix @ query
+        scores = np.empty(self._matrix.shape[0], dtype=np.float32)
+        buffer = np.empty((min(SCORE_BLOCK_ROWS, self._matrix.shape[0]), self._matrix.shape[1]), dtype=np.float32)
+        for start in range(0, self._matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = self._matrix[start:start + SCORE_BLOCK_ROWS]
+            upcast = buffer[:block.shape[0]]
+            upcast[...] = block
+            scores[start:start + SCORE_BLOCK_ROWS] = upcast @ query
+        return scores * self._scales if self._scales is not None else scores
+
+    def _rescore(self, query, rows, scores, top_k):
+        """
+        Re-rank the top_k * rescore_factor best candidates by their full-precision vectors.
+
+        Returns:
+            tuple: (candidate rows, their exact scores)
+        """
+        n_candidates = min(top_k * self.rescore_factor, len(rows))
+        if n_candidates < len(rows):
+            best = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            rows = rows[best]
+        # Sorted rows read the memory-mapped file sequentially
+        rows = np.sort(rows)
+        return rows, np.asarray(self._full[rows], dtype=np.float32) @ query
+
+    def score(self, query_embedding):
+        """Return cosine similarities of query_embedding against every row."""
+        self._consolidate()
+        if self._matrix is None or len(self._node_ids) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._score_rows(self._normalize(np.asarray(query_embedding, dtype=np.float32)))
+
+    def _top_k(self, rows, scores, top_k, query=None):
+        """
+        Build a query result from the top_k highest-scoring candidate rows.
+
+        When query is given and full-precision vectors are kept, the leading
+        candidates are rescored with them first.
+        """
+        top_k = min(top_k, len(rows))
+        if top_k <= 0:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+        if query is not None and self._full is not None and self.keeps_full_precision:
+            rows, scores = self._rescore(query, rows, scores, top_k)
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=[float(scores[i]) for i in best],
+            ids=[self._node_ids[rows[i]] for i in best],
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Return the similarity_top_k most similar live rows."""
+        if query.filters is not None:
+            raise NotImplementedError("Metadata filters are not supported by MmapVectorStore")
+
+        self._consolidate()
+        if self._matrix is None or len(self._node_ids) == 0:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+        query_vector = self._normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        mask = self.live_mask()
+
+        if query.node_ids is None and query.doc_ids is None:
+            self._ensure_ivf()
+            if self._ivf is not None:
+                rows = self._ivf.candidates(query_vector, self.ivf_nprobe)
+                rows = rows[mask[rows]]
+                return self._top_k(rows, self._score_rows(query_vector, rows), query.similarity_top_k, query_vector)
+
+        if query.node_ids is not None:
+            allowed = np.zeros_like(mask)
+            allowed[[self._row_of[n] for n in query.node_ids if n in self._row_of]] = True
+            mask = mask & allowed
+        if query.doc_ids is not None:
+            allowed = np.zeros_like(mask)
+            for doc_id in query.doc_ids:
+                allowed[self._rows_of_ref_doc.get(doc_id, [])] = True
+            mask = mask & allowed
+
+        rows = np.flatnonzero(mask)
+        scores = self._score_rows(query_vector)[rows]
+        return self._top_k(rows, scores, query.similarity_top_k, query_vector)
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        """Write live vectors to vectors.npy and their IDs to vector_ids.json beside persist_path."""
+        persist_dir = os.path.dirname(persist_path)
+        vectors_path = os.path.join(persist_dir, VECTORS_FILENAME)
+        legacy_path = os.path.join(persist_dir, LEGACY_VECTOR_STORE_FILENAME)
+        if not self._dirty and os.path.exists(vectors_path):
+            return
+
+        self._consolidate()
+        os.makedirs(persist_dir, exist_ok=True)
+        live_rows = np.flatnonzero(self.live_mask())
+        if self._matrix is not None:
+            matrix = np.ascontiguousarray(self._matrix[live_rows], dtype=self.dtype)
+        else:
+            matrix = np.zeros((0, 0), dtype=self.dtype)
+        scales = np.ascontiguousarray(self._scales[live_rows]) if self._scales is not None else None
+        full = np.ascontiguousarray(self._full[live_rows]) if self._full is not None else None
+        node_ids = [self._node_ids[row] for row in live_rows]
+        ref_doc_ids = [self._ref_doc_ids[row] for row in live_rows]
+        if self._ivf is not None:
+            self._ivf.compact(live_rows)
+
+        self._save_array(vectors_path, matrix)
+        self._save_array(os.path.join(persist_dir, VECTOR_SCALES_FILENAME), scales)
+        self._save_array(os.path.join(persist_dir, FULL_VECTORS_FILENAME), full)
+        with open(os.path.join(persist_dir, VECTOR_IDS_FILENAME), "w") as f:
+            json.dump({"dtype": self.dtype, "node_ids": node_ids, "ref_doc_ids": ref_doc_ids}, f)
+
+        # The JSON store this replaces would otherwise be stale
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+        # Continue from the compacted state, memory-mapped as it would be after a restart
+        if self._mmap:
+            matrix = np.load(vectors_path, mmap_mode="r")
+            if full is not None:
+                full = np.load(os.path.join(persist_dir, FULL_VECTORS_FILENAME), mmap_mode="r")
+        self._load_arrays(matrix if matrix.size else None, node_ids, ref_doc_ids, scales, full)
+        self._ensure_ivf()
+        ivf_path = os.path.join(persist_dir, IVF_FILENAME)
+        if self._ivf is not None:
+            self._ivf.save(ivf_path)
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
+        self._dirty = False
+        logger.debug(f"Persisted {len(node_ids)} vectors to {vectors_path}")
+
+    @staticmethod
+    def _save_array(path, array):
+        """Atomically write array to path, or remove a stale file when array is None."""
+        if array is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def _convert_loaded(self, stored_dtype):
+        """Re-encode vectors loaded in stored_dtype into this store's dtype."""
+        exact = self._full
+        if exact is None and stored_dtype == "float32":
+            exact = self._matrix
+        source = exact if exact is not None else self._decode(self._matrix, self._scales)
+        source = np.asarray(source, dtype=np.float32)
+        self._matrix, self._scales = self._encode(source)
+        self._full = source if exact is not None and self.keeps_full_precision else None
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, dtype: str = "float32", mmap: bool = True, **kwargs: Any) -> "MmapVectorStore":
+        """
+        Open a persisted store, memory-mapping the vectors.
+
+        A directory written by the default JSON vector store is converted on
+        load; it is rewritten in the binary format on the next persist. Extra
+        keyword arguments (ann, ivf_nlist, ...) configure the store.
+        """
+        store = cls(dtype=dtype, **kwargs)
+        store._mmap = mmap
+        vectors_path = os.path.join(persist_dir, VECTORS_FILENAME)
+        legacy_path = os.path.join(persist_dir, LEGACY_VECTOR_STORE_FILENAME)
+
+        if os.path.exists(vectors_path):
+            with open(os.path.join(persist_dir, VECTOR_IDS_FILENAME), "r") as f:
+                ids = json.load(f)
+            mmap_mode = "r" if mmap else None
+            matrix = np.load(vectors_path, mmap_mode=mmap_mode)
+            scales_path = os.path.join(persist_dir, VECTOR_SCALES_FILENAME)
+            full_path = os.path.join(persist_dir, FULL_VECTORS_FILENAME)
+            scales = np.load(scales_path) if os.path.exists(scales_path) else None
+            full = np.load(full_path, mmap_mode=mmap_mode) if os.path.exists(full_path) else None
+            if matrix.size:
+                store._load_arrays(matrix, ids["node_ids"], ids["ref_doc_ids"], scales, full)
+            else:
+                store._load_arrays(None, ids["node_ids"], ids["ref_doc_ids"])
+            stored_dtype = ids.get("dtype", "float32")
+            if store._matrix is not None and stored_dtype != dtype:
+                logger.info(f"Converting stored vectors from {stored_dtype} to {dtype}...")
+                store._convert_loaded(stored_dtype)
+            elif not store.keeps_full_precision:
+                store._full = None
+            # Rewrite on the next persist if the format changed or full-precision vectors are no longer wanted
+            store._dirty = stored_dtype != dtype or (full is not None and store._full is None)
+            if store.keeps_full_precision and store._matrix is not None and store._full is None:
+                logger.warning("No full-precision vectors are stored; rescoring is disabled until the index is rebuilt.")
+
+            ivf_path = os.path.join(persist_dir, IVF_FILENAME)
+            if store.ann == "ivf" and os.path.exists(ivf_path):
+                ivf = IVFIndex.load(ivf_path)
+                if len(ivf.assignments) == len(store._node_ids):
+                    store._ivf = ivf
+        elif os.path.exists(legacy_path):
+            logger.info("Converting JSON vector store to the memory-mapped format...")
+            legacy = SimpleVectorStore.from_persist_path(legacy_path)
+            node_ids = list(legacy.data.embedding_dict.keys())
+            if node_ids:
+                vectors = cls._normalize(
+                    np.asarray([legacy.data.embedding_dict[n] for n in node_ids], dtype=np.float32)
+                )
+                matrix, scales = store._encode(vectors)
+                full = vectors if store.keeps_full_precision else None
+            else:
+                matrix = scales = full = None
+            ref_doc_ids = [legacy.data.text_id_to_ref_doc_id.get(n) for n in node_ids]
+            store._load_arrays(matrix, node_ids, ref_doc_ids, scales, full)
+            store._dirty = True
+        return store
@@ -14,10 +14,24 @@ document.addEventListener('DOMContentLoaded', function() {
     const tabButtons = document.querySelectorAll('.tab-btn');
     const tabPanes = document.querySelectorAll('.tab-pane');
 
+    // Conversation session of this browser, so its history is kept apart from other users'
+    let sessionId = localStorage.getItem('sessionId');
+    if (!sessionId) {
+        sessionId = crypto.randomUUID ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2);
+        localStorage.setItem('sessionId', sessionId);
+    }
+
     // Check system status
     checkStatus();
-    // Check status every 5 seconds until ready
-    const statusInterval = setInterval(checkStatus, 5000);
+    // Check status every 2 seconds until ready
+    const statusInterval = setInterval(checkStatus, 2000);
+
+    const stageLabels = {
+        idle: 'Waiting to start',
+        loading_model: 'Loading embedding model',
+        scanning_files: 'Scanning documents',
+        indexing: 'Indexing documents'
+    };
 
     // Handle tab switching
     tabButtons.forEach(button => {
@@ -60,8 +74,15 @@ document.addEventListener('DOMContentLoaded', function() {
                     statusText.textContent = `Ready (${data.document_count} documents indexed)`;
                     submitBtn.disabled = false;
                     clearInterval(statusInterval);
+                } else if (data.status === 'failed') {
+                    statusDot.classList.add('error');
+                    statusText.textContent = `Initialization failed: ${data.error}`;
+                    submitBtn.disabled = true;
+                    clearInterval(statusInterval);
                 } else {
-                    statusText.textContent = 'System initializing...';
+                    const stage = stageLabels[data.status] || 'System initializing';
+                    const detail = data.detail ? `, ${data.detail} files` : '';
+                    statusText.textContent = `${stage}... ${Math.round(data.progress)}%${detail}`;
                     submitBtn.disabled = true;
                 }
             })
@@ -73,23 +94,25 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
-    // Ask a question
+    // Ask a question, rendering sources and answer tokens as they stream in
     function askQuestion(question) {
-        fetch('/ask', {
+        sourceAnswer.textContent = '';
+        generalAnswer.textContent = '';
+        sourceList.innerHTML = '';
+        metricsData.innerHTML = '';
+
+        fetch('/ask/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ question: question }),
+            body: JSON.stringify({ question: question, session_id: sessionId }),
         })
         .then(response => {
-            if (!response.ok) {
+            if (!response.ok || !response.body) {
                 throw new Error('Server error');
             }
-            return response.json();
-        })
-        .then(data => {
-            displayResults(data);
+            return readEventStream(response.body.getReader(), handleStreamEvent);
         })
         .catch(error => {
             console.error('Error:', error);
@@ -101,15 +124,61 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Display results
-    function displayResults(data) {
-        // Display answers
-        sourceAnswer.textContent = data.source_based_summary;
-        generalAnswer.textContent = data.general_answer;
-        
-        // Display sources
+    // Parse a Server-Sent Events byte stream and dispatch each event
+    function readEventStream(reader, onEvent) {
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) return;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const message = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let event = 'message';
+                    let data = '';
+                    message.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    });
+                    onEvent(event, JSON.parse(data));
+                }
+                return pump();
+            });
+        }
+        return pump();
+    }
+
+    // Handle a single streamed event
+    function handleStreamEvent(event, data) {
+        switch (event) {
+            case 'sources':
+                renderSources(data.sources);
+                showResults();
+                loadingDiv.classList.add('hidden');
+                break;
+            case 'summary':
+                sourceAnswer.textContent += data;
+                break;
+            case 'general':
+                generalAnswer.textContent += data;
+                break;
+            case 'metrics':
+                renderMetrics(data);
+                break;
+            case 'error':
+                throw new Error(data.error);
+        }
+    }
+
+    // Display sources
+    function renderSources(sources) {
         sourceList.innerHTML = '';
-        data.sources.forEach(source => {
+        sources.forEach(source => {
             const sourceItem = document.createElement('div');
             sourceItem.className = 'source-item';
             
@@ -135,18 +204,42 @@ document.addEventListener('DOMContentLoaded', function() {
             sourceItem.appendChild(sourceText);
             sourceList.appendChild(sourceItem);
         });
-        
-        // Display metrics
+    }
+
+    // Display metrics
+    function renderMetrics(data) {
         metricsData.innerHTML = '';
         
         const metrics = [
-            { label: 'Total Documents', value: data.metrics.total_documents },
-            { label: 'Documents with Matches', value: data.metrics.documents_with_matches },
-            { label: 'Relevant Passages', value: data.metrics.relevant_passages },
-            { label: 'Average Score', value: data.metrics.avg_score.toFixed(2) },
-            { label: 'Search Duration', value: data.metrics.search_duration.toFixed(2), unit: 's' },
-            { label: 'Total Duration', value: data.metrics.total_duration.toFixed(2), unit: 's' }
+            { label: 'Total Documents', value: data.total_documents },
+            { label: 'Documents with Matches', value: data.documents_with_matches },
+            { label: 'Relevant Passages', value: data.relevant_passages },
+            { label: 'Average Score', value: data.avg_score.toFixed(2) },
+            { label: 'Search Duration', value: data.search_duration.toFixed(2), unit: 's' },
+            { label: 'Summary Duration', value: data.summary_duration.toFixed(2), unit: 's' },
+            { label: 'General Answer Duration', value: data.general_answer_duration.toFixed(2), unit: 's' },
+            { label: 'LLM Duration', value: data.llm_duration.toFixed(2), unit: 's' },
+            { label: 'Total Duration', value: data.total_duration.toFixed(2), unit: 's' }
         ];
+        if (data.time_to_first_byte != null) {
+            metrics.push({ label: 'Time to First Byte', value: data.time_to_first_byte.toFixed(2), unit: 's' });
+        }
+        if (data.time_to_first_token != null) {
+            metrics.push({ label: 'Time to First Token', value: data.time_to_first_token.toFixed(2), unit: 's' });
+        }
+        if (data.answer_cache_hit_rate != null) {
+            metrics.push({ label: 'Answer Cache', value: data.answer_cache_hit ? 'Hit' : 'Miss' });
+            metrics.push({ label: 'Answer Cache Hit Rate', value: (data.answer_cache_hit_rate * 100).toFixed(0), unit: '%' });
+        }
+        if (data.context_tokens != null) {
+            metrics.push({ label: 'Context Tokens', value: data.context_tokens });
+            metrics.push({ label: 'Passages Dropped', value: data.context_passages_dropped });
+        }
+        if (data.llm_cache_hit_rate != null) {
+            metrics.push({ label: 'LLM Cache Hit Rate', value: (data.llm_cache_hit_rate * 100).toFixed(0), unit: '%' });
+            metrics.push({ label: 'Avg LLM Cache Hit', value: data.avg_llm_cache_hit_ms.toFixed(3), unit: 'ms' });
+            metrics.push({ label: 'Avg LLM Call', value: data.avg_llm_call_ms.toFixed(0), unit: 'ms' });
+        }
         
         metrics.forEach(metric => {
             const metricCard = document.createElement('div');
@@ -171,11 +264,12 @@ document.addEventListener('DOMContentLoaded', function() {
             metricCard.appendChild(metricValue);
             metricsData.appendChild(metricCard);
         });
-        
-        // Show results
+    }
+
+    // Show results and reset to the first tab
+    function showResults() {
         resultsDiv.classList.remove('hidden');
         
-        // Reset to first tab
         tabButtons.forEach(btn => btn.classList.remove('active'));
         tabButtons[0].classList.add('active');
         